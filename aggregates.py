@@ -0,0 +1,109 @@
+# aggregates.py
+import pandas as pd
+
+from data_utils import (
+    MetroMonthMatrix,
+    finalize_payment_grid,
+    latest_zip_snapshot,
+    metro_month_matrix,
+    payment_to_income_partials,
+)
+
+
+def _fold(acc: pd.DataFrame | None, part: pd.DataFrame) -> pd.DataFrame:
+    if acc is None:
+        return part
+    return acc.add(part, fill_value=0)
+
+
+def _fold_latest(acc: pd.DataFrame | None, part: pd.DataFrame) -> pd.DataFrame:
+    """Keep the most recent row per zipcode across both frames."""
+    if acc is None:
+        return part
+    return (
+        pd.concat([acc, part], ignore_index=True)
+        .sort_values(["zipcode", "date"], kind="stable")
+        .drop_duplicates("zipcode", keep="last")
+        .reset_index(drop=True)
+    )
+
+
+class AggregateAccumulator:
+    """
+    Running per-(metro, month) sums and counts (MetroMonthMatrix.partials)
+    behind composite_series, yearly_metro_summary, metro_pti_series and
+    metro_monthly_series, the mortgage payment grid and each ZIP's latest
+    priced row (latest_zip_snapshot).
+
+    Feed it derived (add_derived_columns) frames in any number of pieces;
+    memory is bounded by the number of groups, not the number of rows.
+    """
+
+    def __init__(self):
+        self.by_metro_month: pd.DataFrame | None = None
+        self.by_year_payment: pd.DataFrame | None = None
+        self.latest_zips: pd.DataFrame | None = None
+        self.rows = 0
+
+    def add(self, df: pd.DataFrame) -> "AggregateAccumulator":
+        self.by_metro_month = _fold(self.by_metro_month, metro_month_matrix(df).partials())
+        self.by_year_payment = _fold(self.by_year_payment, payment_to_income_partials(df))
+        self.latest_zips = _fold_latest(self.latest_zips, latest_zip_snapshot(df))
+        self.rows += len(df)
+        return self
+
+    def append(self, df: pd.DataFrame) -> "AggregateAccumulator":
+        """
+        add() for rows of months not seen yet (e.g. a new HouseTS month).
+        Re-adding an existing month (on any day of it) would double count,
+        so it is refused.
+        """
+        new_months = pd.DatetimeIndex(pd.to_datetime(df["date"].unique())).to_period("M")
+        overlap = self.dates().to_period("M").intersection(new_months)
+        if len(overlap):
+            raise ValueError(
+                "Months already aggregated: "
+                + ", ".join(str(m) for m in overlap.sort_values())
+            )
+        return self.add(df)
+
+    def matrix(self) -> MetroMonthMatrix:
+        return MetroMonthMatrix.from_partials(self.by_metro_month)
+
+    def payment_grid(self) -> pd.DataFrame:
+        return finalize_payment_grid(self.by_year_payment)
+
+    # ---- persistence (snapshot tables) ----
+
+    STATE_TABLES = ["by_metro_month", "by_year_payment"]
+
+    def to_tables(self) -> dict[str, pd.DataFrame]:
+        """Flat frames ("<measure>:sum" / "<measure>:count" columns) for Parquet."""
+        tables = {}
+        for name in self.STATE_TABLES:
+            acc = getattr(self, name)
+            flat = acc.copy()
+            flat.columns = [f"{m}:{stat}" for m, stat in acc.columns]
+            tables[name] = flat.reset_index()
+        tables["latest_zips"] = self.latest_zips
+        return tables
+
+    @classmethod
+    def from_tables(cls, tables: dict[str, pd.DataFrame], rows: int = 0) -> "AggregateAccumulator":
+        acc = cls()
+        for name in cls.STATE_TABLES:
+            flat = tables[name]
+            keys = [c for c in flat.columns if ":" not in c]
+            state = flat.set_index(keys)
+            state.columns = pd.MultiIndex.from_tuples(
+                [tuple(c.split(":", 1)) for c in state.columns]
+            )
+            setattr(acc, name, state)
+        acc.latest_zips = tables.get("latest_zips")
+        acc.rows = rows
+        return acc
+
+    def dates(self) -> pd.DatetimeIndex:
+        if self.by_metro_month is None:
+            return pd.DatetimeIndex([])
+        return pd.DatetimeIndex(self.by_metro_month.index.unique("date")).sort_values()
@@ -0,0 +1,127 @@
+# analytics.py
+"""
+Growth and relative-position measures on top of the metro aggregates.
+
+metro_year_analytics adds, per (city_full, year), the year-over-year PTI
+change, PTI/RTI percentile ranks within the year and the CAGR of price
+and of income since the metro's first year. metro_month_analytics adds a
+trailing 12-month PTI per (city_full, date).
+
+Both work on frames sorted by metro with whole-array operations (group
+start offsets, cumulative sums, binary search), never a per-metro loop.
+"""
+import numpy as np
+import pandas as pd
+
+from diagnostics import traced
+
+ROLLING_MONTHS = 12
+
+
+def _group_starts(codes: np.ndarray) -> np.ndarray:
+    """For rows sorted by group code: position of the first row of each row's group."""
+    first = np.ones(len(codes), dtype=bool)
+    first[1:] = codes[1:] != codes[:-1]
+    starts = np.flatnonzero(first)
+    return starts[np.cumsum(first) - 1]
+
+
+def _cagr(value: np.ndarray, base: np.ndarray, years: np.ndarray) -> np.ndarray:
+    with np.errstate(invalid="ignore", divide="ignore"):
+        growth = (value / base) ** (1.0 / np.where(years > 0, years, 1)) - 1.0
+    return np.where(years > 0, growth, np.nan)
+
+
+@traced
+def metro_year_analytics(summary: pd.DataFrame, metro_series: pd.DataFrame) -> pd.DataFrame:
+    """
+    yearly_metro_summary plus, per metro-year:
+    - pti_yoy_change / pti_yoy_pct: PTI change from the previous year
+      (NaN for a metro's first year or after a gap)
+    - pti_percentile / rti_percentile: rank within the year, 0-1
+    - price_cagr / income_cagr: annual growth since the metro's first
+      year, from yearly means of metro_monthly_series; cagr_gap is
+      price_cagr - income_cagr
+    """
+    yearly = (
+        metro_series.assign(
+            city_full=metro_series["city_full"].astype(str),
+            year=metro_series["date"].dt.year,
+        )
+        .groupby(["city_full", "year"], as_index=False)[
+            ["median_sale_price", "median_household_income_est"]
+        ]
+        .mean()
+    )
+    out = (
+        summary.assign(city_full=summary["city_full"].astype(str))
+        .merge(yearly, on=["city_full", "year"], how="left")
+        .sort_values(["city_full", "year"], kind="stable")
+        .reset_index(drop=True)
+    )
+
+    codes = pd.factorize(out["city_full"])[0]
+    start = _group_starts(codes)
+    rows = np.arange(len(out))
+    prev = np.maximum(rows - 1, 0)
+    year = out["year"].to_numpy(dtype="int64")
+    has_prev = (rows > start) & (year - year[prev] == 1)
+
+    pti = out["price_to_income"].to_numpy(dtype="float64")
+    prev_pti = np.where(has_prev, pti[prev], np.nan)
+    out["pti_yoy_change"] = pti - prev_pti
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out["pti_yoy_pct"] = pti / prev_pti - 1.0
+
+    by_year = out.groupby("year")
+    out["pti_percentile"] = by_year["price_to_income"].rank(pct=True)
+    out["rti_percentile"] = by_year["rent_to_income"].rank(pct=True)
+
+    years = year - year[start]
+    price = out["median_sale_price"].to_numpy(dtype="float64")
+    income = out["median_household_income_est"].to_numpy(dtype="float64")
+    out["price_cagr"] = _cagr(price, price[start], years)
+    out["income_cagr"] = _cagr(income, income[start], years)
+    out["cagr_gap"] = out["price_cagr"] - out["income_cagr"]
+    return out
+
+
+@traced
+def metro_month_analytics(metro_series: pd.DataFrame,
+                          window: int = ROLLING_MONTHS) -> pd.DataFrame:
+    """
+    Per (city_full, date): PTI and its trailing `window`-month mean
+    (pti_rolling_12m for the default window). Missing months count as
+    gaps, not as skipped rows; the mean is NaN until a metro has `window`
+    months of history.
+    """
+    out = (
+        metro_series[["city_full", "date", "price_to_income"]]
+        .assign(city_full=metro_series["city_full"].astype(str))
+        .sort_values(["city_full", "date"], kind="stable")
+        .reset_index(drop=True)
+    )
+    codes = pd.factorize(out["city_full"])[0].astype("int64")
+    start = _group_starts(codes)
+    dates = out["date"]
+    month = (dates.dt.year * 12 + dates.dt.month).to_numpy(dtype="int64")
+    month = month - (month.min() if len(month) else 0)
+
+    # (metro, month) as one sorted key; the window start is a binary search
+    span = int(month.max()) + window + 1 if len(month) else 1
+    key = codes * span + month
+    lo = np.searchsorted(key, key - (window - 1), side="left")
+
+    pti = out["price_to_income"].to_numpy(dtype="float64")
+    valid = ~np.isnan(pti)
+    sums = np.concatenate([[0.0], np.cumsum(np.where(valid, pti, 0.0))])
+    counts = np.concatenate([[0], np.cumsum(valid)])
+    rows = np.arange(len(out))
+    total = sums[rows + 1] - sums[lo]
+    n = counts[rows + 1] - counts[lo]
+
+    covered = month - month[start] >= window - 1
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rolling = np.where(covered & (n > 0), total / n, np.nan)
+    out[f"pti_rolling_{window}m"] = rolling
+    return out
@@ -1,16 +1,14 @@
 # app.py
+import pandas as pd
 import streamlit as st
 
 from data_utils import (
-    load_raw_data,
-    add_derived_columns,
-    composite_series,
-    yearly_metro_summary,
-    affordability_counts_by_year,
     latest_year,
+    top_bottom_metros,
     AFFORDABILITY_ORDER,
     AFFORDABILITY_COLORS,
 )
+from hot_reload import current_data
 from charts import (
     composite_price_income_index_chart,
     #composite_pti_bands_chart,
@@ -18,7 +16,34 @@ from charts import (
     composite_rent_to_income,
     metro_snapshot_bar,
     affordability_bands_with_us_ratio,
+    payment_burden_heatmap,
 )
+from chapters import (
+    CHAPTERS,
+    CHART_WIDTH,
+    FOCUS_YEAR,
+    build_figures,
+    MACRO_INTRO,
+    MACRO_NOTES,
+    DIVERGENCE_INTRO,
+    PTI_EXPLAINER,
+    DIVERGENCE_NOTES,
+    BANDS_INTRO,
+    BANDS_NOTES,
+    RENT_INTRO,
+    RENT_NOTES,
+    SNAPSHOT_INTRO,
+    SNAPSHOT_NOTES,
+    FINANCING_INTRO,
+    FINANCING_NOTES,
+)
+from figure_cache import prefetch
+from diagnostics import begin_rerun, end_rerun, plotly_chart
+from warmup import start_warmup
+
+begin_rerun()
+# no-op after the first run in this process (see serve.py)
+start_warmup()
 
 # ----- GLOBAL STYLE FIXES -----
 st.markdown(
@@ -51,220 +76,175 @@ st.set_page_config(
 st.title("Housing Affordability Explorer - Overview")
 
 
-# ---- load & prep data ----
-raw = load_raw_data()
-df = add_derived_columns(raw)
-comp = composite_series(df)
-summary = yearly_metro_summary(df)
-counts = affordability_counts_by_year(summary)
-year_latest = latest_year(summary)
-
-# ---- tabs / chapters ----
-tab1, tab2, tab3, tab4, tab5 = st.tabs([
-    "1. Prices vs Incomes (Macro Trend)",
-    "2. Metro Affordability Divergence",
-    "3. Affordability Bands",
-    "4. Rent Burden vs Ownership Burden",
-    "5. 2023 Metro Snapshot",
-])
-        
-with tab1:
-    st.subheader("1. Prices vs Incomes (Macro Trend)")
+def zoom_range(dates, key: str) -> tuple | None:
+    """
+    Month-range slider for a time-series chart. Narrowing it rebuilds the
+    chart for that range, so the downsampled lines regain full resolution.
+    None while the whole range is selected.
+    """
+    months = list(pd.DatetimeIndex(pd.unique(dates)).sort_values())
+    lo, hi = st.select_slider(
+        "Zoom",
+        options=months,
+        value=(months[0], months[-1]),
+        format_func=lambda d: d.strftime("%b %Y"),
+        key=key,
+    )
+    return None if (lo, hi) == (months[0], months[-1]) else (lo, hi)
 
-    st.markdown(
-        """
-        Home prices and household incomes do not move together. This chapter compares both series indexed to **2012 = 100**.
 
-        The macro trend answers the first big question: **Is the U.S. housing affordability problem structural?**  
-        The answer is: Yes, prices have consistently pulled away from incomes.
-        """
-    )
+# ---- chapters: each renders only its own inputs ----
+def render_macro_trend(comp):
+    st.subheader("1. Prices vs Incomes (Macro Trend)")
+
+    st.markdown(MACRO_INTRO)
 
     
     with st.container(border=True):
-        st.plotly_chart(
-            composite_price_income_index_chart(comp),
+        x_range = zoom_range(comp["date"], key="macro_zoom")
+        plotly_chart(
+            composite_price_income_index_chart(comp, width_px=CHART_WIDTH, x_range=x_range),
             use_container_width=True,
         )
     
     with st.container(border=True):
 
-        st.markdown(
-            """
-            ### What We notice
-            - If home prices and incomes grew at the same rate, the lines would stay close.  
-            - **Home prices outpaced incomes throughout the last decade.**  
-            - This widening gap sets the foundation for today’s affordability pressures.
-            """
-        )
+        st.markdown(MACRO_NOTES)
+
+def render_metro_divergence(metro_pti, year_ranks):
 
-with tab2:
-    
     col_left, col_right = st.columns([2.3, 1])   # wider left column, narrower right
 
     with col_left:
         st.subheader("2. Metro Affordability Divergence")
-        st.markdown(
-            """
-            Even though national averages show prices growing faster than incomes,
-            the **severity varies dramatically across metros**.
-
-            This chapter ranks metros by **Price-to-Income ratio (PTI)** and
-            traces their affordability trajectories over time.
-            """
-        )
+        st.markdown(DIVERGENCE_INTRO)
 
     with col_right:
         with st.container(border=True):
             st.markdown("#### What is PTI?")
-            st.markdown(
-                """
-                PTI is a simple measure:  
-                **PTI = Median Home Price / Median Household Income**
-
-                - Higher PTI → **less affordable**  
-                - Lower PTI → **more attainable**
-                """
-            )
-
-        focus_year = 2023
+            st.markdown(PTI_EXPLAINER)
+
+        years = sorted(year_ranks["year"].unique().tolist())
+        focus_year = st.select_slider(
+            "Focus year",
+            options=years,
+            value=FOCUS_YEAR if FOCUS_YEAR in years else years[-1],
+            key="focus_year",
+        )
 
     # Chart in a bordered container
     with st.container(border=True):
-        st.plotly_chart(
-            metro_pti_lines(df, focus_year=focus_year),
+        x_range = zoom_range(metro_pti["date"], key="divergence_zoom")
+        plotly_chart(
+            metro_pti_lines(
+                metro_pti, year_ranks, focus_year=focus_year,
+                width_px=CHART_WIDTH, x_range=x_range,
+            ),
             use_container_width=True,
         )
 
-    # --- compute top/bottom 7 metros for that year using `summary` ---
-    summary_year = (
-        summary[summary["year"] == focus_year]
-        .dropna(subset=["price_to_income"])
-    )
-
-    top7 = (
-        summary_year.sort_values("price_to_income", ascending=False)
-        .head(7)["city_full"]
-        .tolist()
-    )
-
-    bottom7 = (
-        summary_year.sort_values("price_to_income", ascending=True)
-        .head(7)["city_full"]
-        .tolist()
-    )
+    # --- top/bottom 7 metros for that year: a lookup in the rank table ---
+    top7, bottom7 = top_bottom_metros(year_ranks, focus_year)
 
     # --- list in a card-style container ---
     with st.container(border=True):
-        st.markdown(
-            """
-            ### What We Notice
-            - Which metros have become “outliers” (extreme PTI)  
-            - Whether affordable metros stayed affordable or caught up to expensive ones
-
-            The story:  
-            **Housing affordability is not evenly distributed—metros are splitting into different trajectories.**
-            """
-        )
+        st.markdown(DIVERGENCE_NOTES)
         st.markdown(f"### Metros Highlighted in {focus_year}")
         st.markdown(f"**Top 7 (Least Affordable – highest PTI):** {', '.join(top7)}")
         st.markdown(f"**Bottom 7 (Most Affordable – lowest PTI):** {', '.join(bottom7)}")
 
 # ----- CHAPTER 3 -----
-with tab3:
+def render_affordability_bands(summary, counts, comp):
     st.subheader("3. Affordability Bands")
 
-    st.markdown(
-        """
-        PTI ratios become even more meaningful when grouped into **affordability categories**.  
-
-        ### PTI Affordability Categories
-        - **Affordable**: PTI ≤ 3.0  
-        - **Moderately Unaffordable**: PTI 3.1–4.0  
-        - **Seriously Unaffordable**: PTI 4.1–5.0  
-        - **Severely Unaffordable**: PTI 5.1-8.9  
-        - **Impossibly Unaffordable**: PTI ≥ 9.0
-        """
-    )
+    st.markdown(BANDS_INTRO)
 
     year_focus = latest_year(summary)
     
     with st.container(border=True):
-        st.plotly_chart(
+        plotly_chart(
         affordability_bands_with_us_ratio(counts, comp),
         use_container_width=True,
         )
 
     with st.container(border=True):
-        st.markdown(
-            """
-        ### What We Notice
-        - Each year, fewer metros remain in the Affordable category, while more are moving into higher PTI ranges.
-        - This indicates a structural and widespread drift toward unaffordability, rather than short-term volatility or isolated market spikes.
-
-        In short:  
-        A decade ago, many metros were still reasonably affordable for median-income households.
-        Today, a growing share has moved into seriously, severely, or even impossibly unaffordable territory.
-        """
-        )
+        st.markdown(BANDS_NOTES)
 
 # ----- CHAPTER 4 -----
-with tab4:
+def render_rent_burden(summary):
     st.subheader("4. Rent Burden vs Ownership Burden")
 
-    st.markdown(
-        """
-        The affordability crisis looks very different depending on whether
-        a household is **renting** or **buying**.
-        """
-    )
+    st.markdown(RENT_INTRO)
 
     with st.container(border=True):
-        st.plotly_chart(
+        plotly_chart(
             composite_rent_to_income(summary),
             use_container_width=True,
         )
         
     with st.container(border=True):
-        st.markdown(
-            """
-            ### Key insight
-            Earlier chapters showed that home prices have pulled far ahead of incomes, pushing ownership burden sharply upward.  
-            This chart adds another dimension: rent burden hasn’t moved much at all.
-
-            Together, these trends reveal that:
-            - The affordability crisis is not uniform.
-            - For renters, costs have grown slowly and predictably relative to income.
-            - For buyers, costs have surged far faster than incomes can keep up with.
-
-            **Bottom Line**:
-            Renting remains more closely coupled to income, but the leap to homeownership has become increasingly unattainable.
-            """
-        )
+        st.markdown(RENT_NOTES)
 
 # ----- CHAPTER 5 -----
-with tab5:
+def render_metro_snapshot(summary):
     st.subheader("5. 2023 Metro Snapshot")
 
-    st.markdown(
-        """
-        This final chapter provides a **recent snapshot** of affordability conditions.
-        """
-    )
+    st.markdown(SNAPSHOT_INTRO)
 
     fig = metro_snapshot_bar(summary)
 
     with st.container(border=True):
-        st.plotly_chart(fig, use_container_width=True)
+        plotly_chart(fig, use_container_width=True)
+
+    with st.container(border=True):
+        st.markdown(SNAPSHOT_NOTES)
+
+# ----- CHAPTER 6 -----
+def render_payment_burden(payment_grid):
+    st.subheader("6. Financing: Payment-to-Income")
+
+    st.markdown(FINANCING_INTRO)
 
     with st.container(border=True):
-        st.markdown(
-        """
-        ### What you can see here
-
-        - PTI levels for all metros in the most recent year  
-        - Which metros are currently the **least affordable**  
-        - Which metros remain relatively **more attainable**  
-        - How these map into our affordability bands
-        """
-        )
\ No newline at end of file
+        plotly_chart(payment_burden_heatmap(payment_grid), use_container_width=True)
+
+    with st.container(border=True):
+        st.markdown(FINANCING_NOTES)
+
+
+# chapter key (chapters.CHAPTERS) -> Streamlit renderer
+RENDERERS = {
+    "macro": render_macro_trend,
+    "divergence": render_metro_divergence,
+    "bands": render_affordability_bands,
+    "rent": render_rent_burden,
+    "snapshot": render_metro_snapshot,
+    "financing": render_payment_burden,
+}
+
+
+# ---- load & prep data (precomputed snapshot, else cached pipeline) ----
+data = current_data()
+
+# ---- chapter picker: only the selected chapter computes and renders ----
+titles = [chapter.title for chapter in CHAPTERS]
+selected = st.segmented_control(
+    "Chapter",
+    titles,
+    default=titles[0],
+    key="chapter",
+    label_visibility="collapsed",
+) or titles[0]
+
+idx = titles.index(selected)
+chapter = CHAPTERS[idx]
+RENDERERS[chapter.key](**chapter.inputs(data))
+
+# warm the figure cache for the next chapter while this one is read
+next_chapter = CHAPTERS[(idx + 1) % len(CHAPTERS)]
+prefetch(
+    build_figures, next_chapter, next_chapter.inputs(data),
+    key=(data.version, next_chapter.key),
+)
+
+end_rerun()
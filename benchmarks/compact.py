@@ -0,0 +1,87 @@
+# benchmarks/compact.py
+"""
+Check the compact schema (data_utils.compact_frame) against the
+full-precision frame.
+
+    python -m benchmarks.compact [--zips 2000] [--rtol 1e-6]
+
+Fails (exits non-zero) if any float32 ratio, or any aggregate computed
+from the compact frame, is further than rtol from its float64 value, or
+if a date does not round-trip. Runs on month-end and month-start dates.
+float32 keeps about 7 significant digits (rounding error <= 6e-8), so
+the default COMPACT_RTOL of 1e-6 leaves headroom without hiding a real
+precision loss.
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+import data_utils
+from benchmarks.synthetic import synthetic_housets
+
+COMPACT_RTOL = 1e-6
+STAGES = ["composite_series", "yearly_metro_summary", "metro_pti_series", "metro_monthly_series"]
+DATE_FREQS = ["ME", "MS"]
+
+
+def check_compact(df: pd.DataFrame, rtol: float = COMPACT_RTOL) -> list[str]:
+    """Failures of compact_frame(df) against df (an add_derived_columns frame)."""
+    compact = data_utils.compact_frame(df)
+    failures = []
+
+    dates = data_utils.day_to_timestamp(compact["date"])
+    if not (dates.to_numpy() == df["date"].to_numpy(dtype="datetime64[ns]")).all():
+        failures.append("date: compact dates do not round-trip")
+
+    errors = data_utils.memory_report(df, compact)["max_rel_error"]
+    for col in data_utils.RATIO_COLUMNS:
+        error = errors.get(col, np.nan)
+        if not error <= rtol:
+            failures.append(f"{col}: max relative error {error:.2e} > {rtol:.0e}")
+
+    for stage in STAGES:
+        expected = getattr(data_utils, stage)(df).reset_index(drop=True)
+        got = getattr(data_utils, stage)(compact).reset_index(drop=True)
+        try:
+            pd.testing.assert_frame_equal(
+                got, expected, rtol=rtol, check_dtype=False, check_categorical=False
+            )
+        except AssertionError as exc:
+            failures.append(f"{stage}: {str(exc).splitlines()[0]}")
+    return failures
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--zips", type=int, default=2000)
+    parser.add_argument("--metros", type=int, default=60)
+    parser.add_argument("--months", type=int, default=144)
+    parser.add_argument("--rtol", type=float, default=COMPACT_RTOL)
+    args = parser.parse_args(argv)
+
+    failed = False
+    for freq in DATE_FREQS:
+        raw = synthetic_housets(
+            n_zips=args.zips, n_metros=args.metros, n_months=args.months,
+            start="2012-01-01", freq=freq,
+        )
+        df = data_utils.add_derived_columns(raw)
+
+        start = time.perf_counter()
+        failures = check_compact(df, args.rtol)
+        seconds = time.perf_counter() - start
+        label = f"compact {freq:<3}"
+        if failures:
+            failed = True
+            print(f"{label} FAILED in {seconds:.2f}s (rtol {args.rtol:.0e})")
+            for failure in failures:
+                print(f"    {failure}")
+        else:
+            print(f"{label} OK in {seconds:.2f}s (rtol {args.rtol:.0e})")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
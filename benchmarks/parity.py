@@ -0,0 +1,156 @@
+# benchmarks/parity.py
+"""
+Check every installed aggregation engine against the pandas reference,
+and the streaming and append paths against the in-memory build.
+
+    python -m benchmarks.parity [--engines duckdb polars] [--zips 2000]
+                                [--chunksize 5000]
+
+Runs each engine's aggregates on seeded synthetic data (with zero/NaN
+rent and income) and compares them with data_utils frame by frame.
+Then compares every snapshot table of build_derived with stream_derived
+(small chunks) and with a snapshot built from the earlier months plus
+append_to_snapshot for the last ones.
+Exits non-zero on any mismatch; engines that are not installed are
+reported as skipped.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+import data_utils
+import pipeline
+from benchmarks.synthetic import synthetic_housets
+from engines import ENGINES, get_engine
+
+STAGES = ["composite_series", "yearly_metro_summary", "metro_pti_series"]
+
+
+def check_engine(engine, df: pd.DataFrame, rtol: float = 1e-9) -> list[str]:
+    """Names of the stages whose output differs from the pandas reference."""
+    reference = get_engine("pandas")
+    failures = []
+    for stage in STAGES:
+        expected = getattr(reference, stage)(df).reset_index(drop=True)
+        got = getattr(engine, stage)(df).reset_index(drop=True)
+        try:
+            pd.testing.assert_frame_equal(got, expected, rtol=rtol)
+        except AssertionError as exc:
+            failures.append(f"{stage}: {str(exc).splitlines()[0]}")
+
+    expected = reference.metro_month_matrix(df).partials()
+    got = engine.metro_month_matrix(df).partials()
+    try:
+        pd.testing.assert_frame_equal(got, expected, rtol=rtol)
+    except AssertionError as exc:
+        failures.append(f"metro_month_matrix: {str(exc).splitlines()[0]}")
+
+    summary = reference.yearly_metro_summary(df)
+    expected = reference.affordability_counts_by_year(summary).reset_index(drop=True)
+    got = engine.affordability_counts_by_year(summary).reset_index(drop=True)
+    try:
+        pd.testing.assert_frame_equal(got, expected)
+    except AssertionError as exc:
+        failures.append(f"affordability_counts_by_year: {str(exc).splitlines()[0]}")
+    return failures
+
+
+def _compare_derived(got, expected, rtol: float) -> list[str]:
+    failures = []
+    for name in pipeline.SNAPSHOT_TABLES:
+        try:
+            pd.testing.assert_frame_equal(
+                getattr(got, name).reset_index(drop=True),
+                getattr(expected, name).reset_index(drop=True),
+                rtol=rtol,
+                check_dtype=False,
+                check_categorical=False,
+            )
+        except AssertionError as exc:
+            failures.append(f"{name}: {str(exc).splitlines()[0]}")
+    if got.year_latest != expected.year_latest:
+        failures.append(f"year_latest: {got.year_latest} != {expected.year_latest}")
+    return failures
+
+
+def check_pipeline_paths(raw: pd.DataFrame, chunksize: int,
+                         rtol: float = 1e-9) -> dict[str, list[str]]:
+    """
+    Failures per path ("stream", "append") against build_derived on the
+    same rows, read back through a CSV like the real file.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "housets.csv")
+        raw.to_csv(csv_path, index=False)
+        expected = pipeline.build_derived(data_utils.read_ingested(csv_path))
+
+        streamed = pipeline.stream_derived(csv_path, chunksize=chunksize)
+
+        rows = pd.read_csv(csv_path)
+        last = sorted(rows["date"].unique())[-3:]
+        earlier, new = rows[~rows["date"].isin(last)], rows[rows["date"].isin(last)]
+        snapshot_dir = os.path.join(tmp, "snapshot")
+        acc = pipeline.AggregateAccumulator().add(data_utils.add_derived_columns(earlier))
+        pipeline.write_snapshot(
+            pipeline.derived_from_accumulator(acc), snapshot_dir, accumulator=acc
+        )
+        pipeline.append_to_snapshot(new, snapshot_dir)
+        appended = pipeline.read_snapshot(snapshot_dir)
+
+    return {
+        "stream": _compare_derived(streamed, expected, rtol),
+        "append": _compare_derived(appended, expected, rtol),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--engines", nargs="+", default=[n for n in ENGINES if n != "pandas"])
+    parser.add_argument("--zips", type=int, default=2000)
+    parser.add_argument("--metros", type=int, default=60)
+    parser.add_argument("--months", type=int, default=144)
+    parser.add_argument("--chunksize", type=int, default=5000,
+                        help="rows per chunk for the streaming check")
+    args = parser.parse_args(argv)
+
+    raw = synthetic_housets(n_zips=args.zips, n_metros=args.metros, n_months=args.months)
+    df = data_utils.add_derived_columns(raw)
+
+    failed = False
+    for name in args.engines:
+        try:
+            engine = get_engine(name)
+        except ImportError as exc:
+            print(f"{name:<8} SKIPPED ({exc})")
+            continue
+        start = time.perf_counter()
+        failures = check_engine(engine, df)
+        seconds = time.perf_counter() - start
+        if failures:
+            failed = True
+            print(f"{name:<8} FAILED in {seconds:.2f}s")
+            for failure in failures:
+                print(f"    {failure}")
+        else:
+            print(f"{name:<8} OK in {seconds:.2f}s")
+
+    start = time.perf_counter()
+    paths = check_pipeline_paths(raw, args.chunksize)
+    seconds = time.perf_counter() - start
+    for name, failures in paths.items():
+        if failures:
+            failed = True
+            print(f"{name:<8} FAILED")
+            for failure in failures:
+                print(f"    {failure}")
+        else:
+            print(f"{name:<8} OK")
+    print(f"(pipeline paths checked in {seconds:.2f}s)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
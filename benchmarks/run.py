@@ -0,0 +1,191 @@
+# benchmarks/run.py
+"""
+Time every data_utils stage and charts builder on synthetic HouseTS data.
+
+    python -m benchmarks.run [--scales 1 10 100] [--months 144] [--out FILE]
+
+Scale 1 is 1,000 ZIPs in 30 metros; ZIPs and metros grow with the scale
+(metros capped at 900). Each stage reports wall time and, unless
+--no-memory is given, peak traced allocation from a second, traced run
+(tracemalloc sees Python and NumPy buffers, not Arrow's own pool).
+Results are written as JSON (by default to benchmarks/results/).
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import plotly
+
+import analytics
+import charts
+import data_utils
+from benchmarks.synthetic import write_synthetic_csv
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def scale_params(scale: int, n_months: int) -> dict:
+    return dict(n_zips=1000 * scale, n_metros=min(30 * scale, 900), n_months=n_months)
+
+
+def _measure(fn, setup=None, memory: bool = True):
+    """Run fn() for wall time, then again under tracemalloc for peak bytes."""
+    if setup:
+        setup()
+    gc.collect()
+    start = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - start
+
+    peak = None
+    if memory:
+        if setup:
+            setup()
+        gc.collect()
+        tracemalloc.start()
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, seconds, peak
+
+
+def _rows(obj) -> int | None:
+    return len(obj) if isinstance(obj, pd.DataFrame) else None
+
+
+def run_scale(scale: int, n_months: int, workdir: str, memory: bool = True) -> list[dict]:
+    params = scale_params(scale, n_months)
+    csv_path = os.path.join(workdir, f"HouseTS_x{scale}.csv")
+    n_rows = write_synthetic_csv(csv_path, **params)
+    parquet_path = data_utils.ingest_cache_path(csv_path)
+
+    def drop_ingest_cache():
+        if os.path.exists(parquet_path):
+            os.remove(parquet_path)
+
+    results = []
+
+    def stage(name, fn, rows_in, setup=None):
+        out, seconds, peak = _measure(fn, setup=setup, memory=memory)
+        results.append({
+            "scale": scale,
+            "stage": name,
+            "rows_in": rows_in,
+            "rows_out": _rows(out),
+            "seconds": round(seconds, 6),
+            "peak_bytes": peak,
+        })
+        print(f"  x{scale:<4} {name:<42} {seconds:9.3f}s"
+              + (f" {peak / 2**20:9.1f} MiB" if peak is not None else ""))
+        return out
+
+    raw = stage("load_raw_data (csv, cold ingest)",
+                lambda: data_utils.read_ingested(csv_path), n_rows, setup=drop_ingest_cache)
+    raw = stage("load_raw_data (parquet cache)",
+                lambda: data_utils.read_ingested(csv_path), n_rows)
+    df = stage("add_derived_columns", lambda: data_utils.add_derived_columns(raw), len(raw))
+    matrix = stage("metro_month_matrix", lambda: data_utils.metro_month_matrix(df), len(df))
+    stage("metro_month_matrix reductions",
+          lambda: (matrix.composite(), matrix.summary(), matrix.metro_pti(), matrix.metro_series()),
+          len(df))
+    comp = stage("composite_series", lambda: data_utils.composite_series(df), len(df))
+    summary = stage("yearly_metro_summary", lambda: data_utils.yearly_metro_summary(df), len(df))
+    metro_pti = stage("metro_pti_series", lambda: data_utils.metro_pti_series(df), len(df))
+    counts = stage("affordability_counts_by_year",
+                   lambda: data_utils.affordability_counts_by_year(summary), len(summary))
+    metro_series = stage("metro_monthly_series",
+                         lambda: data_utils.metro_monthly_series(df), len(df))
+    stage("analytics.metro_year_analytics",
+          lambda: analytics.metro_year_analytics(summary, metro_series), len(summary))
+    stage("analytics.metro_month_analytics",
+          lambda: analytics.metro_month_analytics(metro_series), len(metro_series))
+    payment_grid = stage("payment_to_income_partials",
+                         lambda: data_utils.finalize_payment_grid(
+                             data_utils.payment_to_income_partials(df)), len(df))
+
+    compact = stage("compact_frame", lambda: data_utils.compact_frame(df), len(df))
+    report = data_utils.memory_report(df, compact)
+    results.append({
+        "scale": scale,
+        "stage": "compact_frame memory",
+        "bytes_before": int(report.loc["TOTAL", "bytes_before"]),
+        "bytes_after": int(report.loc["TOTAL", "bytes_after"]),
+        "max_rel_error": float(report["max_rel_error"].max()),
+    })
+
+    focus_year = data_utils.latest_year(summary)
+    year_ranks = stage("year_rankings", lambda: data_utils.year_rankings(summary), len(summary))
+    builders = [
+        ("composite_price_income_index_chart", lambda: charts.composite_price_income_index_chart.uncached(comp), len(comp)),
+        ("metro_pti_lines", lambda: charts.metro_pti_lines.uncached(metro_pti, year_ranks, focus_year), len(metro_pti)),
+        ("affordability_bands_with_us_ratio", lambda: charts.affordability_bands_with_us_ratio.uncached(counts, comp), len(counts)),
+        ("composite_rent_to_income", lambda: charts.composite_rent_to_income.uncached(summary), len(summary)),
+        ("metro_snapshot_bar", lambda: charts.metro_snapshot_bar.uncached(summary), len(summary)),
+        ("payment_burden_heatmap", lambda: charts.payment_burden_heatmap.uncached(payment_grid), len(payment_grid)),
+    ]
+    for name, fn, rows_in in builders:
+        stage(f"charts.{name}", fn, rows_in)
+
+    drop_ingest_cache()
+    os.remove(csv_path)
+    return results
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--months", type=int, default=144)
+    parser.add_argument("--out", default=None, help="JSON results file")
+    parser.add_argument("--workdir", default=None, help="where synthetic CSVs are written")
+    parser.add_argument("--no-memory", action="store_true", help="skip the traced peak-memory runs")
+    args = parser.parse_args(argv)
+
+    commit = _git_commit()
+    meta = {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "plotly": plotly.__version__,
+        "months": args.months,
+        "scales": {str(s): scale_params(s, args.months) for s in args.scales},
+    }
+
+    results = []
+    with tempfile.TemporaryDirectory(dir=args.workdir) as workdir:
+        for scale in args.scales:
+            print(f"scale x{scale}: {scale_params(scale, args.months)}")
+            results.extend(run_scale(scale, args.months, workdir, memory=not args.no_memory))
+
+    out = args.out or os.path.join(
+        RESULTS_DIR, f"bench-{time.strftime('%Y%m%d-%H%M%S')}-{commit or 'nogit'}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as fh:
+        json.dump({"meta": meta, "results": results}, fh, indent=2)
+    print(f"Wrote {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
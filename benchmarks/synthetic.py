@@ -0,0 +1,65 @@
+# benchmarks/synthetic.py
+"""Seeded synthetic HouseTS data with the real column names."""
+import numpy as np
+import pandas as pd
+
+# share of rows with a zero / missing value, roughly as in HouseTS
+ZERO_RATE = 0.03
+NAN_RATE = 0.02
+# share of rows with no city_full (metro)
+MISSING_METRO_RATE = 0.005
+
+
+def synthetic_housets(n_zips: int = 1000, n_metros: int = 30, n_months: int = 144,
+                      start: str = "2012-01-31", seed: int = 0,
+                      freq: str = "ME") -> pd.DataFrame:
+    """
+    One row per (zipcode, month), dated by `freq` ("ME" month-end like
+    HouseTS, "MS" month-start). Each ZIP belongs to one metro; prices
+    and incomes follow a per-metro level with a gentle trend, and rent and
+    income get sprinkled zeros and NaNs like the real file, and a few
+    rows miss their city_full.
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(start, periods=n_months, freq=freq)
+    metros = np.array([f"Metro {i:04d}, ST" for i in range(n_metros)], dtype=object)
+
+    zip_metro = rng.integers(0, n_metros, n_zips)
+    metro_price = rng.lognormal(12.4, 0.35, n_metros)
+    metro_income = rng.lognormal(10.4, 0.2, n_metros)
+
+    n_rows = n_zips * n_months
+    zip_idx = np.repeat(np.arange(n_zips), n_months)
+    month_idx = np.tile(np.arange(n_months), n_zips)
+    metro_idx = zip_metro[zip_idx]
+    t = month_idx / 12.0
+
+    price = metro_price[metro_idx] * np.exp(0.05 * t + rng.normal(0, 0.25, n_rows))
+    income = metro_income[metro_idx] * np.exp(0.025 * t + rng.normal(0, 0.2, n_rows))
+    rent = price * 0.006 * np.exp(rng.normal(0, 0.15, n_rows))
+
+    for values in (rent, income):
+        draw = rng.random(n_rows)
+        values[draw < ZERO_RATE] = 0.0
+        values[(draw >= ZERO_RATE) & (draw < ZERO_RATE + NAN_RATE)] = np.nan
+
+    city_full = metros[metro_idx]
+    city_full[rng.random(n_rows) < MISSING_METRO_RATE] = None
+
+    date_col = dates[month_idx]
+    return pd.DataFrame({
+        "date": date_col.strftime("%Y-%m-%d"),
+        "median_sale_price": price.round(0),
+        "Median Rent": rent.round(0),
+        "Per Capita Income": income.round(0),
+        "zipcode": 10000 + zip_idx,
+        "city": np.array([m.split(",")[0] for m in metros], dtype=object)[metro_idx],
+        "city_full": city_full,
+        "year": date_col.year,
+    })
+
+
+def write_synthetic_csv(path: str, **kwargs) -> int:
+    df = synthetic_housets(**kwargs)
+    df.to_csv(path, index=False)
+    return len(df)
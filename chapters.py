@@ -0,0 +1,223 @@
+# chapters.py
+"""
+Story chapters: titles, text, data dependencies and figures.
+
+Shared by app.py (renders them with Streamlit) and export.py (renders
+them to static files), so the two never drift apart.
+"""
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+import charts
+from data_utils import top_bottom_metros
+from downsample import DEFAULT_CHART_WIDTH
+
+FOCUS_YEAR = 2023
+# full-width charts in the wide layout; sets the LTTB point budget
+CHART_WIDTH = DEFAULT_CHART_WIDTH
+
+
+# ---------- TEXT ----------
+
+MACRO_INTRO = """
+Home prices and household incomes do not move together. This chapter compares both series indexed to **2012 = 100**.
+
+The macro trend answers the first big question: **Is the U.S. housing affordability problem structural?**  
+The answer is: Yes, prices have consistently pulled away from incomes.
+"""
+
+MACRO_NOTES = """
+### What We notice
+- If home prices and incomes grew at the same rate, the lines would stay close.  
+- **Home prices outpaced incomes throughout the last decade.**  
+- This widening gap sets the foundation for today’s affordability pressures.
+"""
+
+DIVERGENCE_INTRO = """
+Even though national averages show prices growing faster than incomes,
+the **severity varies dramatically across metros**.
+
+This chapter ranks metros by **Price-to-Income ratio (PTI)** and
+traces their affordability trajectories over time.
+"""
+
+PTI_EXPLAINER = """
+PTI is a simple measure:  
+**PTI = Median Home Price / Median Household Income**
+
+- Higher PTI → **less affordable**  
+- Lower PTI → **more attainable**
+"""
+
+DIVERGENCE_NOTES = """
+### What We Notice
+- Which metros have become “outliers” (extreme PTI)  
+- Whether affordable metros stayed affordable or caught up to expensive ones
+
+The story:  
+**Housing affordability is not evenly distributed—metros are splitting into different trajectories.**
+"""
+
+BANDS_INTRO = """
+PTI ratios become even more meaningful when grouped into **affordability categories**.  
+
+### PTI Affordability Categories
+- **Affordable**: PTI ≤ 3.0  
+- **Moderately Unaffordable**: PTI 3.1–4.0  
+- **Seriously Unaffordable**: PTI 4.1–5.0  
+- **Severely Unaffordable**: PTI 5.1-8.9  
+- **Impossibly Unaffordable**: PTI ≥ 9.0
+"""
+
+BANDS_NOTES = """
+### What We Notice
+- Each year, fewer metros remain in the Affordable category, while more are moving into higher PTI ranges.
+- This indicates a structural and widespread drift toward unaffordability, rather than short-term volatility or isolated market spikes.
+
+In short:  
+A decade ago, many metros were still reasonably affordable for median-income households.
+Today, a growing share has moved into seriously, severely, or even impossibly unaffordable territory.
+"""
+
+RENT_INTRO = """
+The affordability crisis looks very different depending on whether
+a household is **renting** or **buying**.
+"""
+
+RENT_NOTES = """
+### Key insight
+Earlier chapters showed that home prices have pulled far ahead of incomes, pushing ownership burden sharply upward.  
+This chart adds another dimension: rent burden hasn’t moved much at all.
+
+Together, these trends reveal that:
+- The affordability crisis is not uniform.
+- For renters, costs have grown slowly and predictably relative to income.
+- For buyers, costs have surged far faster than incomes can keep up with.
+
+**Bottom Line**:
+Renting remains more closely coupled to income, but the leap to homeownership has become increasingly unattainable.
+"""
+
+SNAPSHOT_INTRO = """
+This chapter provides a **recent snapshot** of affordability conditions.
+"""
+
+SNAPSHOT_NOTES = """
+### What you can see here
+
+- PTI levels for all metros in the most recent year  
+- Which metros are currently the **least affordable**  
+- Which metros remain relatively **more attainable**  
+- How these map into our affordability bands
+"""
+
+FINANCING_INTRO = """
+PTI compares prices with incomes, but buyers pay with a **mortgage**: what
+matters month to month is the payment, which depends on the interest rate
+and the down payment as much as on the price.
+"""
+
+FINANCING_NOTES = """
+### Reading the grid
+
+- Each cell is one financing scenario: a 30-year fixed rate and a down payment
+- The color is the share of ZIP-months where the monthly payment takes more
+  than 30% of household income, a common cost-burden line
+- Hover for the average payment-to-income in that scenario
+
+Moving right along a row shows how much a rate change alone pushes
+households over the line; moving down shows how far a larger down payment
+offsets it.
+"""
+
+
+# ---------- REGISTRY ----------
+
+@dataclass(frozen=True)
+class FigureSpec:
+    """A charts.py builder call, with DerivedData fields as positional args."""
+    builder: str
+    args: tuple[str, ...]
+    kwargs: dict = field(default_factory=dict)
+
+    def build(self, inputs: dict):
+        builder = getattr(charts, self.builder)
+        return builder(*(inputs[name] for name in self.args), **self.kwargs)
+
+
+@dataclass(frozen=True)
+class Chapter:
+    key: str
+    title: str
+    deps: tuple[str, ...]              # DerivedData fields the chapter reads
+    figures: tuple[FigureSpec, ...]
+    text: tuple[str, ...]              # markdown blocks in reading order
+
+    def inputs(self, data) -> dict:
+        return {name: getattr(data, name) for name in self.deps}
+
+
+CHAPTERS = [
+    Chapter(
+        "macro",
+        "1. Prices vs Incomes (Macro Trend)",
+        ("comp",),
+        (FigureSpec("composite_price_income_index_chart", ("comp",), {"width_px": CHART_WIDTH}),),
+        (MACRO_INTRO, MACRO_NOTES),
+    ),
+    Chapter(
+        "divergence",
+        "2. Metro Affordability Divergence",
+        ("metro_pti", "year_ranks"),
+        (FigureSpec(
+            "metro_pti_lines",
+            ("metro_pti", "year_ranks"),
+            {"focus_year": FOCUS_YEAR, "width_px": CHART_WIDTH},
+        ),),
+        (DIVERGENCE_INTRO, "#### What is PTI?\n" + PTI_EXPLAINER, DIVERGENCE_NOTES),
+    ),
+    Chapter(
+        "bands",
+        "3. Affordability Bands",
+        ("summary", "counts", "comp"),
+        (FigureSpec("affordability_bands_with_us_ratio", ("counts", "comp")),),
+        (BANDS_INTRO, BANDS_NOTES),
+    ),
+    Chapter(
+        "rent",
+        "4. Rent Burden vs Ownership Burden",
+        ("summary",),
+        (FigureSpec("composite_rent_to_income", ("summary",)),),
+        (RENT_INTRO, RENT_NOTES),
+    ),
+    Chapter(
+        "snapshot",
+        "5. 2023 Metro Snapshot",
+        ("summary",),
+        (FigureSpec("metro_snapshot_bar", ("summary",)),),
+        (SNAPSHOT_INTRO, SNAPSHOT_NOTES),
+    ),
+    Chapter(
+        "financing",
+        "6. Financing: Payment-to-Income",
+        ("payment_grid",),
+        (FigureSpec("payment_burden_heatmap", ("payment_grid",)),),
+        (FINANCING_INTRO, FINANCING_NOTES),
+    ),
+]
+
+
+def build_figures(chapter: Chapter, inputs: dict) -> list:
+    """Build (or fetch from the figure cache) every figure of a chapter."""
+    return [spec.build(inputs) for spec in chapter.figures]
+
+
+def highlight_text(year_ranks: pd.DataFrame, year: int) -> str:
+    """The chapter-2 list of highlighted metros, as markdown."""
+    top7, bottom7 = top_bottom_metros(year_ranks, year)
+    return (
+        f"### Metros Highlighted in {year}\n\n"
+        f"**Top 7 (Least Affordable – highest PTI):** {', '.join(top7)}\n\n"
+        f"**Bottom 7 (Most Affordable – lowest PTI):** {', '.join(bottom7)}"
+    )
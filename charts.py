@@ -6,19 +6,37 @@ from plotly.subplots import make_subplots
 import numpy as np
 
 
-from data_utils import AFFORDABILITY_COLORS, AFFORDABILITY_ORDER, classify_affordability
+from figure_cache import cached_figure
+from downsample import visible_points
+from diagnostics import traced
+from data_utils import (
+    AFFORDABILITY_COLORS,
+    AFFORDABILITY_ORDER,
+    PAYMENT_BURDEN,
+    classify_affordability_array,
+    top_bottom_metros,
+)
 
 
 # ---------- CHAPTER 1: MACRO TREND ----------
 
-def composite_price_income_index_chart(comp: pd.DataFrame) -> go.Figure:
-    """Composite price vs income, indexed to 2012 = 100."""
+@traced
+@cached_figure
+def composite_price_income_index_chart(comp: pd.DataFrame, width_px: int | None = None,
+                                       x_range: tuple | None = None) -> go.Figure:
+    """
+    Composite price vs income, indexed to 2012 = 100. With width_px the
+    series are LTTB-downsampled for that width (see downsample.py), after
+    clipping to x_range.
+    """
     long = comp.melt(
         id_vars="date",
         value_vars=["price_index", "income_index"],
         var_name="Series",
         value_name="Index (2012=100)",
     )
+    long = visible_points(long, "date", "Index (2012=100)", by="Series",
+                          width_px=width_px, x_range=x_range)
     fig = px.line(
         long,
         x="date",
@@ -32,59 +50,95 @@ def composite_price_income_index_chart(comp: pd.DataFrame) -> go.Figure:
 
 # ---------- CHAPTER 2: METRO DIVERGENCE ----------
 
-def metro_pti_lines(df: pd.DataFrame, focus_year: int) -> go.Figure:
-    """
-    Plot metro-level PTI trends over time, with the top/bottom 7 metros
-    (by PTI in the focus_year) highlighted.
+# Above this many metros, metro_pti_lines switches to WebGL with one
+# NaN-separated trace per highlight group instead of one SVG trace per metro.
+HIGH_CARDINALITY_METROS = 60
 
-    df can be ZIP-level; we aggregate to metro-by-date first.
-    """
+METRO_GROUP_COLORS = {
+    "Top 7 (Least Affordable)": "#B71C1C",
+    "Bottom 7 (Most Affordable)": "#1E88E5",
+    "Other": "#B0BEC5",
+}
 
-    # 1) Aggregate ZIPs → metro-level series
-    df_metro = (
-        df.groupby(["city_full", "year", "date"], as_index=False)["price_to_income"]
-        .mean()
-        .dropna(subset=["price_to_income"])
-    )
 
-    # 2) Compute snapshot for the focus year (metro-level PTI)
-    snapshot = (
-        df_metro[df_metro["year"] == focus_year]
-        .groupby("city_full", as_index=False)["price_to_income"]
-        .mean()
-        .dropna(subset=["price_to_income"])
+def _collapsed_group_trace(sub: pd.DataFrame, name: str, color: str) -> go.Scattergl:
+    """
+    All metros of one group as a single Scattergl trace, with a NaN point
+    between consecutive metros so the lines are not joined.
+    """
+    sub = sub.sort_values(["city_full", "date"], kind="stable")
+    city = sub["city_full"].to_numpy(dtype=object)
+    x = sub["date"].to_numpy()
+    y = sub["price_to_income"].to_numpy(dtype="float64")
+
+    breaks = np.flatnonzero(city[1:] != city[:-1]) + 1
+    x = np.insert(x, breaks, x[breaks - 1])
+    y = np.insert(y, breaks, np.nan)
+    city = np.insert(city, breaks, None)
+
+    return go.Scattergl(
+        x=x,
+        y=y,
+        mode="lines",
+        name=name,
+        line=dict(color=color, width=1 if name == "Other" else 2),
+        hovertext=city,
+        connectgaps=False,
+        hovertemplate="<b>%{hovertext}</b><br>Date=%{x}<br>PTI=%{y}<extra></extra>",
     )
 
-    top = snapshot.sort_values("price_to_income", ascending=False).head(7)["city_full"]
-    bottom = snapshot.sort_values("price_to_income", ascending=True).head(7)["city_full"]
-
-    def label_group(city: str) -> str:
-        if city in top.values:
-            return "Top 7 (Least Affordable)"
-        if city in bottom.values:
-            return "Bottom 7 (Most Affordable)"
-        return "Other"
 
-    df_plot = df_metro.copy()
-    df_plot["group"] = df_plot["city_full"].apply(label_group)
-
-    color_map = {
-        "Top 7 (Least Affordable)": "#B71C1C",
-        "Bottom 7 (Most Affordable)": "#1E88E5",
-        "Other": "#B0BEC5",
-    }
+@traced
+@cached_figure
+def metro_pti_lines(df_metro: pd.DataFrame, year_ranks: pd.DataFrame, focus_year: int,
+                    max_svg_metros: int = HIGH_CARDINALITY_METROS,
+                    width_px: int | None = None,
+                    x_range: tuple | None = None) -> go.Figure:
+    """
+    Plot metro-level PTI trends over time, with the top/bottom 7 metros
+    (by PTI in the focus_year) highlighted.
 
-    fig = px.line(
-        df_plot,
-        x="date",
-        y="price_to_income",
-        line_group="city_full",
-        color="group",
-        color_discrete_map=color_map,
-        labels={"price_to_income": "PTI", "date": "Date"},
-        title=f"Metro Price-to-Income Trends (Top/Bottom 7 Highlighted for {focus_year})",
-        hover_name="city_full",
+    df_metro is the metro-by-date series from data_utils.metro_pti_series;
+    the highlighted metros are looked up in year_ranks
+    (data_utils.year_rankings).
+    With more than max_svg_metros metros the figure is drawn with three
+    WebGL traces (one per group); hover still names the metro.
+    With width_px each metro's line is LTTB-downsampled for that width,
+    after clipping to x_range.
+    """
+    top, bottom = top_bottom_metros(year_ranks, focus_year)
+
+    df_plot = visible_points(df_metro, "date", "price_to_income", by="city_full",
+                             width_px=width_px, x_range=x_range).copy()
+    df_plot["group"] = np.select(
+        [df_plot["city_full"].isin(top), df_plot["city_full"].isin(bottom)],
+        ["Top 7 (Least Affordable)", "Bottom 7 (Most Affordable)"],
+        default="Other",
     )
+
+    title = f"Metro Price-to-Income Trends (Top/Bottom 7 Highlighted for {focus_year})"
+
+    if df_plot["city_full"].nunique() > max_svg_metros:
+        fig = go.Figure()
+        # "Other" first so the highlighted groups draw on top
+        for group in ["Other", "Bottom 7 (Most Affordable)", "Top 7 (Least Affordable)"]:
+            sub = df_plot[df_plot["group"] == group]
+            if not sub.empty:
+                fig.add_trace(_collapsed_group_trace(sub, group, METRO_GROUP_COLORS[group]))
+        fig.update_layout(title=title, hovermode="closest")
+        fig.update_yaxes(title_text="PTI")
+    else:
+        fig = px.line(
+            df_plot,
+            x="date",
+            y="price_to_income",
+            line_group="city_full",
+            color="group",
+            color_discrete_map=METRO_GROUP_COLORS,
+            labels={"price_to_income": "PTI", "date": "Date"},
+            title=title,
+            hover_name="city_full",
+        )
     fig.update_layout(legend_title_text="")
     fig.update_xaxes(title_text="")
 
@@ -93,6 +147,8 @@ def metro_pti_lines(df: pd.DataFrame, focus_year: int) -> go.Figure:
 
 
 # ---------- CHAPTER 4: Affordability Bands ----------
+@traced
+@cached_figure
 def affordability_bands_with_us_ratio(counts: pd.DataFrame,
                                       comp: pd.DataFrame) -> go.Figure:
     """
@@ -109,7 +165,7 @@ def affordability_bands_with_us_ratio(counts: pd.DataFrame,
         .rename(columns={"composite_pti": "us_pti"})
     )
     
-    us_pti["band"] = us_pti["us_pti"].apply(classify_affordability)
+    us_pti["band"] = classify_affordability_array(us_pti["us_pti"])
 
     # Figure with secondary y-axis
     fig = make_subplots(specs=[[{"secondary_y": True}]])
@@ -305,6 +361,8 @@ def affordability_bands_with_us_ratio(counts: pd.DataFrame,
 
 # ---------- CHAPTER 4: RENT BURDEN ----------
 
+@traced
+@cached_figure
 def composite_rent_to_income(summary: pd.DataFrame) -> go.Figure:
     comp = (
         summary.groupby("year", as_index=False)["rent_to_income"]
@@ -359,6 +417,8 @@ def composite_rent_to_income(summary: pd.DataFrame) -> go.Figure:
 
 # ---------- CHAPTER 5: SNAPSHOT ----------
 
+@traced
+@cached_figure
 def metro_snapshot_bar(summary):
     """
     Build the horizontal bar chart for the latest year,
@@ -433,4 +493,70 @@ def metro_snapshot_bar(summary):
             font=dict(size=10, color="white"),
         )
         
-    return fig
\ No newline at end of file
+    return fig
+
+
+# ---------- CHAPTER 6: FINANCING ----------
+
+@traced
+@cached_figure
+def payment_burden_heatmap(payment_grid: pd.DataFrame) -> go.Figure:
+    """
+    Latest year's share of ZIP-months whose mortgage payment exceeds
+    PAYMENT_BURDEN of income, for each mortgage rate x down payment.
+    """
+    year_latest = int(payment_grid["year"].max())
+    latest = payment_grid[payment_grid["year"] == year_latest]
+    share = latest.pivot(index="down_payment", columns="rate", values="share_burdened")
+    mean = latest.pivot(index="down_payment", columns="rate", values="payment_to_income")
+
+    fig = go.Figure(go.Heatmap(
+        z=share.to_numpy() * 100,
+        x=[f"{r:.1%}" for r in share.columns],
+        y=[f"{d:.1%} down" for d in share.index],
+        customdata=mean.to_numpy(),
+        colorscale="Reds",
+        zmin=0,
+        zmax=100,
+        colorbar=dict(title="% burdened"),
+        texttemplate="%{z:.0f}%",
+        hovertemplate=
+            "Rate: %{x}<br>"
+            "Down payment: %{y}<br>"
+            f"Paying over {PAYMENT_BURDEN:.0%} of income: %{{z:.1f}}%<br>"
+            "Mean payment-to-income: %{customdata:.1%}<extra></extra>",
+    ))
+    fig.update_layout(
+        title=f"Share of ZIPs Where the Mortgage Payment Exceeds {PAYMENT_BURDEN:.0%} of Income ({year_latest})",
+        xaxis_title="30-Year Mortgage Rate",
+        yaxis_title="",
+    )
+    return fig
+
+
+# ---------- TIME SERIES COMPARISON ----------
+
+@traced
+@cached_figure
+def metro_series_comparison(series: dict, measure_label: str) -> go.Figure:
+    """
+    One line per metro from {metro: (dates, values)}, as returned by
+    metro_index.MetroSeriesIndex.compare.
+    """
+    fig = go.Figure()
+    for metro, (dates, values) in series.items():
+        fig.add_trace(go.Scatter(
+            x=dates,
+            y=values,
+            mode="lines",
+            name=metro,
+            hovertemplate=f"<b>{metro}</b><br>%{{x|%b %Y}}: %{{y:.2f}}<extra></extra>",
+        ))
+    fig.update_layout(
+        title=f"{measure_label} Over Time",
+        yaxis_title=measure_label,
+        legend_title_text="",
+        hovermode="x unified",
+    )
+    fig.update_xaxes(title_text="")
+    return fig
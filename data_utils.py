@@ -1,7 +1,12 @@
 # data_utils.py
+import os
+
 import numpy as np
 import pandas as pd
-import streamlit as st
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from diagnostics import traced
 
 # Demographia categories
 AFFORDABILITY_ORDER = [
@@ -21,29 +26,171 @@ AFFORDABILITY_COLORS = {
 }
 
 
+# Per-capita income -> household income
+AVERAGE_HOUSEHOLD_SIZE = 2.54
+
+# Upper PTI bound (inclusive) of each category but the last
+AFFORDABILITY_THRESHOLDS = [3.0, 4.0, 5.0, 8.9]
+
+
 def classify_affordability(pti: float):
     """Demographia thresholds based on price-to-income."""
     if pd.isna(pti):
         return None
-    if pti <= 3.0:
-        return "Affordable"
-    elif pti <= 4.0:
-        return "Moderately Unaffordable"
-    elif pti <= 5.0:
-        return "Seriously Unaffordable"
-    elif pti <= 8.9:
-        return "Severely Unaffordable"
-    else:
-        return "Impossibly Unaffordable"
-
-
-@st.cache_data(show_spinner="Loading HouseTS_reduced.csv …")
+    for upper, label in zip(AFFORDABILITY_THRESHOLDS, AFFORDABILITY_ORDER):
+        if pti <= upper:
+            return label
+    return AFFORDABILITY_ORDER[-1]
+
+
+def classify_affordability_array(pti, thresholds=AFFORDABILITY_THRESHOLDS) -> pd.Categorical:
+    """
+    Vectorized classify_affordability: map a whole PTI array to an ordered
+    categorical over AFFORDABILITY_ORDER. NaN stays missing.
+    """
+    values = np.asarray(pti, dtype="float64")
+    # side="left": a PTI exactly on a threshold falls in the lower band
+    codes = np.searchsorted(np.asarray(thresholds, dtype="float64"), values, side="left")
+    codes[np.isnan(values)] = -1
+    return pd.Categorical.from_codes(codes, categories=AFFORDABILITY_ORDER, ordered=True)
+
+
+# Columns of the raw HouseTS CSV the pipeline actually uses, with the
+# on-disk types of the columnar ingest cache.
+RAW_SCHEMA = pa.schema([
+    ("date", pa.timestamp("ns")),
+    ("median_sale_price", pa.float64()),
+    ("Median Rent", pa.float64()),
+    ("Per Capita Income", pa.float64()),
+    ("city_full", pa.string()),
+    ("year", pa.int16()),
+    ("zipcode", pa.int32()),
+])
+RAW_COLUMNS = RAW_SCHEMA.names
+
+# bump when RAW_SCHEMA changes so old cache files are rebuilt
+INGEST_VERSION = "2"
+
+
+def ingest_cache_path(csv_path: str) -> str:
+    """Parquet cache file that sits next to the CSV."""
+    return os.path.splitext(csv_path)[0] + ".parquet"
+
+
+def _csv_stamp(csv_path: str) -> str:
+    stat = os.stat(csv_path)
+    return f"{INGEST_VERSION}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def ingest_csv(csv_path: str, parquet_path: str | None = None) -> str:
+    """
+    Convert the HouseTS CSV into a typed Parquet file holding only
+    RAW_COLUMNS. The source CSV's size/mtime is stored in the file
+    metadata so a replaced CSV is detected on the next read.
+    """
+    parquet_path = parquet_path or ingest_cache_path(csv_path)
+
+    df = pd.read_csv(
+        csv_path,
+        usecols=RAW_COLUMNS,
+        dtype={
+            "median_sale_price": "float64",
+            "Median Rent": "float64",
+            "Per Capita Income": "float64",
+            "city_full": "string",
+        },
+        parse_dates=["date"],
+    )
+    df["year"] = df["year"].astype("int16")
+    df["zipcode"] = df["zipcode"].astype("int32")
+
+    table = pa.Table.from_pandas(df[RAW_COLUMNS], schema=RAW_SCHEMA, preserve_index=False)
+    table = table.replace_schema_metadata({"source_stamp": _csv_stamp(csv_path)})
+
+    # write-then-rename so readers never see a half-written file
+    tmp_path = parquet_path + ".tmp"
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, parquet_path)
+    return parquet_path
+
+
+def _cache_is_fresh(csv_path: str, parquet_path: str) -> bool:
+    if not os.path.exists(parquet_path):
+        return False
+    try:
+        metadata = pq.read_schema(parquet_path).metadata or {}
+    except (OSError, pa.ArrowException):
+        return False
+    return metadata.get(b"source_stamp", b"").decode() == _csv_stamp(csv_path)
+
+
+@traced
+def read_ingested(csv_path: str, columns: list[str] | None = None) -> pd.DataFrame:
+    """
+    Read the raw data through the Parquet cache, (re)building it from the
+    CSV when missing or stale. Only `columns` are read from disk.
+    """
+    parquet_path = ingest_cache_path(csv_path)
+    if not _cache_is_fresh(csv_path, parquet_path):
+        try:
+            ingest_csv(csv_path, parquet_path)
+        except OSError:
+            # read-only data dir: fall back to parsing the CSV directly
+            return pd.read_csv(csv_path, usecols=columns or RAW_COLUMNS)
+
+    return pd.read_parquet(parquet_path, columns=columns or RAW_COLUMNS)
+
+
+def iter_raw_chunks(csv_path: str, chunksize: int = 500_000):
+    """Yield the raw CSV as frames of at most `chunksize` rows (RAW_COLUMNS only)."""
+    yield from pd.read_csv(
+        csv_path,
+        usecols=RAW_COLUMNS,
+        dtype={
+            "median_sale_price": "float64",
+            "Median Rent": "float64",
+            "Per Capita Income": "float64",
+        },
+        chunksize=chunksize,
+    )
+
+
+def _read_only(values: np.ndarray) -> np.ndarray:
+    view = values.view()
+    view.flags.writeable = False
+    return view
+
+
+def freeze_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    The same columns without copying, with NumPy-backed ones read-only, so
+    a frame shared between sessions raises on in-place writes. Adding or
+    replacing columns on a shallow copy is still fine (copy-on-write).
+    """
+    columns = {
+        col: (
+            _read_only(df[col].to_numpy())
+            if isinstance(df[col].dtype, np.dtype)
+            else df[col].array
+        )
+        for col in df.columns
+    }
+    return pd.DataFrame(columns, index=df.index, copy=False)
+
+
+@traced
 def load_raw_data(path: str = "data/HouseTS_reduced.csv") -> pd.DataFrame:
-    """Read the raw HouseTS CSV."""
-    return pd.read_csv(path)
+    """
+    Read the raw HouseTS data (via the columnar ingest cache). Not cached
+    in memory: the app serves shared aggregates (pipeline.load_app_data),
+    never the raw rows.
+    """
+    return read_ingested(path)
 
 
-def add_derived_columns(df_raw: pd.DataFrame) -> pd.DataFrame:
+@traced
+def add_derived_columns(df_raw: pd.DataFrame,
+                        household_size: float = AVERAGE_HOUSEHOLD_SIZE) -> pd.DataFrame:
     """
     Prepare main working DataFrame.
 
@@ -55,19 +202,20 @@ def add_derived_columns(df_raw: pd.DataFrame) -> pd.DataFrame:
     - city_full
     - year
     """
-    df = df_raw.copy()
+    # shallow: columns are added or replaced, never written in place, so
+    # df_raw (possibly a shared read-only frame) is not copied
+    df = df_raw.copy(deep=False)
 
     # time
-    df["date"] = pd.to_datetime(df["date"])
+    df["date"] = pd.to_datetime(df["date"]).astype("datetime64[ns]")
     # recompute year from date to be safe
     df["year"] = df["date"].dt.year
 
     # safe denominators
     income_pc = df["Per Capita Income"].replace(0, np.nan)
     rent = df["Median Rent"].replace(0, np.nan)
-    
-    AVERAGE_HOUSEHOLD_SIZE = 2.54
-    df["median_household_income_est"] = income_pc * AVERAGE_HOUSEHOLD_SIZE
+
+    df["median_household_income_est"] = income_pc * household_size
 
     # core ratios
     df["price_to_income"] = df["median_sale_price"] / df["median_household_income_est"]
@@ -75,10 +223,365 @@ def add_derived_columns(df_raw: pd.DataFrame) -> pd.DataFrame:
     df["price_to_rent"] = df["median_sale_price"] / (rent * 12.0)
 
     # affordability category
-    df["affordability_rating"] = df["price_to_income"].apply(classify_affordability)
+    df["affordability_rating"] = classify_affordability_array(df["price_to_income"])
 
     return df
 
+
+# ---------- MORTGAGE PAYMENT-TO-INCOME ----------
+
+# default financing grid: 30-year fixed rates x down-payment shares
+MORTGAGE_RATES = [0.03, 0.04, 0.05, 0.06, 0.07, 0.08]
+DOWN_PAYMENTS = [0.035, 0.10, 0.20]
+MORTGAGE_TERM_YEARS = 30
+# payments above this share of income count as cost-burdened
+PAYMENT_BURDEN = 0.30
+# bound on the (rows x scenarios) block computed at once
+PAYMENT_MEMORY_BUDGET = 64 * 2**20
+
+
+def mortgage_grid(rates=MORTGAGE_RATES, down_payments=DOWN_PAYMENTS,
+                  term_years: int = MORTGAGE_TERM_YEARS) -> pd.DataFrame:
+    """
+    One row per (rate, down_payment) scenario, with `factor`: the annual
+    payment per dollar of sale price (amortized loan of price x (1 - d)).
+    """
+    rate, down = (a.ravel() for a in np.meshgrid(rates, down_payments, indexing="ij"))
+    monthly = rate / 12.0
+    n = term_years * 12
+    with np.errstate(invalid="ignore", divide="ignore"):
+        annuity = np.where(monthly > 0, monthly / (1.0 - (1.0 + monthly) ** -n), 1.0 / n)
+    return pd.DataFrame({
+        "scenario": np.arange(len(rate)),
+        "rate": rate,
+        "down_payment": down,
+        "factor": 12.0 * annuity * (1.0 - down),
+    })
+
+
+@traced
+def payment_to_income_partials(df: pd.DataFrame, grid: pd.DataFrame | None = None,
+                               memory_budget: int = PAYMENT_MEMORY_BUDGET) -> pd.DataFrame:
+    """
+    Mortgage payment / household income for every ZIP-month row and every
+    grid scenario, reduced per (year, scenario) to a sum, a non-NaN count
+    and a count of rows above PAYMENT_BURDEN (columns are
+    ("payment_to_income", stat), the layout AggregateAccumulator folds).
+
+    The (rows x scenarios) ratios are one broadcast division, done in row
+    chunks so no block exceeds memory_budget bytes.
+    """
+    grid = mortgage_grid() if grid is None else grid
+    factor = grid["factor"].to_numpy(dtype="float64")
+    # payment / income = (price / income) x factor
+    ratio = df["price_to_income"].to_numpy(dtype="float64")
+    years = _year_key(df).to_numpy()
+
+    # the block plus two same-shaped temporaries (valid, burdened)
+    chunk = max(1, memory_budget // (3 * 8 * len(factor)))
+    parts = []
+    for start in range(0, len(ratio), chunk):
+        block = ratio[start:start + chunk, None] * factor[None, :]
+        valid = ~np.isnan(block)
+        keys = years[start:start + chunk]
+        parts.append(pd.concat({
+            "sum": pd.DataFrame(np.where(valid, block, 0.0)).groupby(keys).sum(),
+            "count": pd.DataFrame(valid).groupby(keys).sum(),
+            "burdened": pd.DataFrame(block > PAYMENT_BURDEN).groupby(keys).sum(),
+        }, axis=1))
+
+    columns = pd.MultiIndex.from_product([["payment_to_income"], ["sum", "count", "burdened"]])
+    if not parts:
+        index = pd.MultiIndex.from_arrays(
+            [np.array([], dtype=years.dtype), np.array([], dtype="int64")],
+            names=["year", "scenario"],
+        )
+        return pd.DataFrame(index=index, columns=columns, dtype="float64")
+
+    wide = pd.concat(parts).groupby(level=0).sum()
+    # (year) x (stat, scenario) -> (year, scenario) x stat
+    out = wide.stack(level=1, future_stack=True)
+    out.index.names = ["year", "scenario"]
+    out.columns = columns
+    return out.astype("float64")
+
+
+def finalize_payment_grid(partials: pd.DataFrame, grid: pd.DataFrame | None = None) -> pd.DataFrame:
+    """
+    year, rate, down_payment, mean payment_to_income and share_burdened
+    (share of ZIP-months paying more than PAYMENT_BURDEN of income).
+    """
+    grid = mortgage_grid() if grid is None else grid
+    stats = partials["payment_to_income"].sort_index()
+    count = stats["count"].to_numpy()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(count > 0, stats["sum"].to_numpy() / count, np.nan)
+        share = np.where(count > 0, stats["burdened"].to_numpy() / count, np.nan)
+    out = pd.DataFrame({
+        "year": stats.index.get_level_values("year").astype("int64"),
+        "scenario": stats.index.get_level_values("scenario").astype("int64"),
+        "payment_to_income": mean,
+        "share_burdened": share,
+    })
+    out = out.merge(grid[["scenario", "rate", "down_payment"]], on="scenario", how="left")
+    return out[["year", "rate", "down_payment", "payment_to_income", "share_burdened"]]
+
+
+# ---------- COMPACT FRAMES ----------
+
+RATIO_COLUMNS = ["price_to_income", "rent_to_income", "price_to_rent"]
+
+
+def day_to_timestamp(days) -> pd.Series | pd.DatetimeIndex:
+    """Int day numbers (days since 1970-01-01) -> timestamps."""
+    stamps = pd.DatetimeIndex(np.asarray(days, dtype="int64").astype("datetime64[D]"))
+    stamps = stamps.astype("datetime64[ns]")
+    if isinstance(days, pd.Series):
+        return pd.Series(stamps, index=days.index, name=days.name)
+    return stamps
+
+
+def _is_day_coded(df: pd.DataFrame) -> bool:
+    return pd.api.types.is_integer_dtype(df["date"])
+
+
+def _year_key(df: pd.DataFrame) -> pd.Series:
+    """`year` column, or the year of int day numbers."""
+    if "year" in df.columns:
+        return df["year"]
+    return day_to_timestamp(df["date"]).dt.year.rename("year")
+
+
+def _decode_dates(out: pd.DataFrame) -> pd.DataFrame:
+    if _is_day_coded(out):
+        out["date"] = day_to_timestamp(out["date"])
+    return out
+
+
+@traced
+def compact_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Narrow an add_derived_columns frame for long-lived storage:
+    city_full and affordability_rating as categoricals, ratios as float32,
+    dates as int32 day numbers (days since 1970-01-01, so any day of the
+    month round-trips) and no separate `year` column. The data_utils
+    aggregates accept the result directly.
+
+    This is a library helper: the app never keeps a ZIP-level frame (see
+    pipeline.load_derived); build_derived(compact=True) and
+    benchmarks/compact.py are its callers.
+    """
+    out = df.drop(columns=["year"])
+    out["date"] = df["date"].to_numpy(dtype="datetime64[D]").astype("int64").astype("int32")
+    out["city_full"] = df["city_full"].astype("category")
+    if not isinstance(df["affordability_rating"].dtype, pd.CategoricalDtype):
+        out["affordability_rating"] = pd.Categorical(
+            df["affordability_rating"], categories=AFFORDABILITY_ORDER, ordered=True
+        )
+    for col in RATIO_COLUMNS:
+        out[col] = df[col].astype("float32")
+    return out
+
+
+def memory_report(before: pd.DataFrame, after: pd.DataFrame) -> pd.DataFrame:
+    """
+    Bytes per column of two versions of a frame (e.g. before/after
+    compact_frame), plus the largest relative error of float columns.
+    """
+    report = pd.DataFrame({
+        "bytes_before": before.memory_usage(index=False, deep=True),
+        "bytes_after": after.memory_usage(index=False, deep=True),
+    })
+    report.loc["TOTAL"] = report.sum()
+    report["bytes_after"] = report["bytes_after"].fillna(0).astype("int64")
+
+    max_rel_error = {}
+    for col in after.columns.intersection(before.columns):
+        if pd.api.types.is_float_dtype(after[col]) and after[col].dtype != before[col].dtype:
+            ref = before[col].to_numpy(dtype="float64")
+            with np.errstate(invalid="ignore", divide="ignore"):
+                rel = np.abs(after[col].to_numpy(dtype="float64") - ref) / np.abs(ref)
+            max_rel_error[col] = float(np.nanmax(rel)) if np.isfinite(rel).any() else 0.0
+    report["max_rel_error"] = pd.Series(max_rel_error)
+    return report
+
+
+# ---------- METRO x MONTH MATRIX ----------
+
+# measures held per (metro, month) cell: the ratios plus their price/income inputs
+METRO_SERIES_MEASURES = RATIO_COLUMNS + ["median_sale_price", "median_household_income_est"]
+
+# ZIP-level measure -> composite_series column
+COMPOSITE_MEASURES = {
+    "median_sale_price": "composite_price",
+    "median_household_income_est": "composite_income",
+    "price_to_income": "composite_pti",
+}
+
+
+def _cell_mean(sums: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """sums / counts; NaN where there are no values, like .mean()."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+class MetroMonthMatrix:
+    """
+    Dense metro-by-month arrays for every METRO_SERIES_MEASURES measure:
+    sums[m] and counts[m] (non-NaN ZIP values), both (metros, months),
+    plus rows, the number of ZIP rows per cell (0: no data that month).
+    `metros` (city_full) and `months` (date) label the axes, sorted; a
+    trailing NaN metro holds the ZIP rows without a city_full, which only
+    the composite counts.
+
+    The aggregates are reductions of these arrays over one axis. Means are
+    sums / counts, so they stay ZIP-weighted like the group-bys they
+    replace (e.g. the composite averages every ZIP of a month).
+    """
+
+    def __init__(self, metros: pd.Index, months: pd.Index, rows: np.ndarray,
+                 sums: dict[str, np.ndarray], counts: dict[str, np.ndarray]):
+        self.metros = metros
+        self.months = months
+        self.rows = rows
+        self.sums = sums
+        self.counts = counts
+
+    @classmethod
+    def from_partials(cls, partials: pd.DataFrame) -> "MetroMonthMatrix":
+        """Inverse of partials(); partials folded together are fine too."""
+        metro_idx, metros = pd.factorize(
+            partials.index.get_level_values("city_full"), sort=True, use_na_sentinel=False
+        )
+        month_idx, months = pd.factorize(partials.index.get_level_values("date"), sort=True)
+
+        def scatter(column, dtype):
+            out = np.zeros((len(metros), len(months)), dtype=dtype)
+            out[metro_idx, month_idx] = partials[column].to_numpy(dtype=dtype)
+            return out
+
+        return cls(
+            pd.Index(metros),
+            pd.Index(months),
+            scatter(("rows", "count"), "int64"),
+            {m: scatter((m, "sum"), "float64") for m in METRO_SERIES_MEASURES},
+            {m: scatter((m, "count"), "int64") for m in METRO_SERIES_MEASURES},
+        )
+
+    def partials(self) -> pd.DataFrame:
+        """
+        The non-empty cells as a long frame: (city_full, date) index,
+        (measure, "sum" / "count") columns and ("rows", "count"). This is
+        the layout aggregates.AggregateAccumulator folds and stores.
+        """
+        metro_idx, month_idx = np.nonzero(self.rows)
+        index = pd.MultiIndex.from_arrays(
+            [self.metros.take(metro_idx), self.months.take(month_idx)],
+            names=["city_full", "date"],
+        )
+        columns = {}
+        for m in METRO_SERIES_MEASURES:
+            columns[(m, "sum")] = self.sums[m][metro_idx, month_idx]
+            columns[(m, "count")] = self.counts[m][metro_idx, month_idx]
+        columns[("rows", "count")] = self.rows[metro_idx, month_idx]
+        return pd.DataFrame(columns, index=index)
+
+    def _named(self, cells: np.ndarray) -> np.ndarray:
+        """cells (a bool/count array) with the no-metro row masked out."""
+        return (cells > 0) & self.metros.notna()[:, None]
+
+    def years(self) -> np.ndarray:
+        """Year of each month column."""
+        return self.months.year.to_numpy()
+
+    def composite(self) -> pd.DataFrame:
+        """composite_series: every ZIP of a month (with or without a metro)."""
+        grouped = pd.DataFrame({"date": self.months})
+        for m, col in COMPOSITE_MEASURES.items():
+            grouped[col] = _cell_mean(self.sums[m].sum(axis=0), self.counts[m].sum(axis=0))
+        return finalize_composite(grouped)
+
+    def summary(self) -> pd.DataFrame:
+        """yearly_metro_summary: month columns summed per year (reduceat)."""
+        years = self.years()
+        first = np.ones(len(years), dtype=bool)
+        first[1:] = years[1:] != years[:-1]
+        starts = np.flatnonzero(first)
+
+        def by_year(values):
+            return np.add.reduceat(values, starts, axis=1)
+
+        metro_idx, year_idx = np.nonzero(self._named(by_year(self.rows)))
+        summary = pd.DataFrame({
+            "city_full": self.metros.take(metro_idx),
+            "year": years[starts][year_idx],
+        })
+        for m in ("price_to_income", "rent_to_income"):
+            summary[m] = _cell_mean(
+                by_year(self.sums[m])[metro_idx, year_idx],
+                by_year(self.counts[m])[metro_idx, year_idx],
+            )
+        return finalize_metro_summary(summary)
+
+    def metro_pti(self) -> pd.DataFrame:
+        """metro_pti_series: the cells that have a PTI."""
+        counts = self.counts["price_to_income"]
+        metro_idx, month_idx = np.nonzero(self._named(counts))
+        out = pd.DataFrame({
+            "city_full": self.metros.take(metro_idx),
+            "year": self.years()[month_idx],
+            "date": self.months.take(month_idx),
+            "price_to_income": _cell_mean(
+                self.sums["price_to_income"][metro_idx, month_idx],
+                counts[metro_idx, month_idx],
+            ),
+        })
+        return out
+
+    def metro_series(self) -> pd.DataFrame:
+        """metro_monthly_series: the cells that have any ratio."""
+        has_ratio = np.logical_or.reduce([self.counts[m] > 0 for m in RATIO_COLUMNS])
+        metro_idx, month_idx = np.nonzero(self._named(has_ratio))
+        out = pd.DataFrame({
+            "city_full": self.metros.take(metro_idx).astype(str),
+            "date": self.months.take(month_idx),
+        })
+        for m in METRO_SERIES_MEASURES:
+            out[m] = _cell_mean(
+                self.sums[m][metro_idx, month_idx], self.counts[m][metro_idx, month_idx]
+            )
+        return out
+
+
+@traced
+def metro_month_matrix(df: pd.DataFrame) -> MetroMonthMatrix:
+    """
+    MetroMonthMatrix of an add_derived_columns (or compact_frame) frame.
+    city_full and date are encoded once; each measure is then summed into
+    its cell with np.bincount. Rows without a metro go to the NaN metro
+    row; rows without a date are left out. Day-coded (compact_frame) dates
+    are decoded here, once per month label.
+    """
+    metro_idx, metros = pd.factorize(df["city_full"], sort=True, use_na_sentinel=False)
+    month_idx, months = pd.factorize(df["date"], sort=True)
+    if _is_day_coded(df):
+        months = day_to_timestamp(months)
+    keep = month_idx >= 0
+    cell = metro_idx[keep] * len(months) + month_idx[keep]
+    shape = (len(metros), len(months))
+    size = shape[0] * shape[1]
+
+    sums, counts = {}, {}
+    for m in METRO_SERIES_MEASURES:
+        values = df[m].to_numpy(dtype="float64")[keep]
+        valid = ~np.isnan(values)
+        sums[m] = np.bincount(cell[valid], weights=values[valid], minlength=size).reshape(shape)
+        counts[m] = np.bincount(cell[valid], minlength=size).reshape(shape)
+    rows = np.bincount(cell, minlength=size).reshape(shape)
+    return MetroMonthMatrix(pd.Index(metros), pd.Index(months), rows, sums, counts)
+
+
+@traced
 def composite_series(df: pd.DataFrame) -> pd.DataFrame:
     """
     Composite (simple average across metros) over time.
@@ -87,20 +590,14 @@ def composite_series(df: pd.DataFrame) -> pd.DataFrame:
       date, composite_price, composite_income,
       composite_pti, price_index, income_index, year
     """
-    grouped = (
-        df.groupby("date", as_index=False)[
-            ["median_sale_price", "median_household_income_est", "price_to_income"]
-        ]
-        .mean()
-        .rename(
-            columns={
-                "median_sale_price": "composite_price",
-                "median_household_income_est": "composite_income",
-                "price_to_income": "composite_pti",
-            }
-        )
-    )
+    return metro_month_matrix(df).composite()
+
 
+def finalize_composite(grouped: pd.DataFrame) -> pd.DataFrame:
+    """
+    Index/rate per-date composite means (date, composite_price,
+    composite_income, composite_pti) the way composite_series returns them.
+    """
     # normalize to first year's values
     first_year = grouped["date"].dt.year.min()
     base = grouped[grouped["date"].dt.year == first_year].iloc[0]
@@ -112,34 +609,78 @@ def composite_series(df: pd.DataFrame) -> pd.DataFrame:
     )
 
     grouped["year"] = grouped["date"].dt.year
-    grouped["affordability_rating"] = grouped["composite_pti"].apply(
-        classify_affordability
-    )
+    grouped["affordability_rating"] = classify_affordability_array(grouped["composite_pti"])
     return grouped
 
 
+@traced
 def yearly_metro_summary(df: pd.DataFrame) -> pd.DataFrame:
     """
     One row per (city_full, year) summarizing PTI, rent burden
     """
-    summary = (
-        df.groupby(["city_full", "year"], as_index=False)
-        .agg(
-            price_to_income=("price_to_income", "mean"),
-            rent_to_income=("rent_to_income", "mean"),
-        )
-    )
+    return metro_month_matrix(df).summary()
 
-    summary["affordability_rating"] = summary["price_to_income"].apply(
-        classify_affordability
-    )
+
+def finalize_metro_summary(summary: pd.DataFrame) -> pd.DataFrame:
+    """Rate per-(city_full, year) PTI/RTI means."""
+    summary["affordability_rating"] = classify_affordability_array(summary["price_to_income"])
     return summary
 
 
+@traced
+def metro_pti_series(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Metro-by-date PTI: ZIP-level PTI averaged per (city_full, year, date).
+    Input for charts.metro_pti_lines.
+    """
+    return metro_month_matrix(df).metro_pti()
+
+
+@traced
+def metro_monthly_series(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Metro-by-month means of ZIP-level PTI, RTI, price-to-rent, sale price
+    and household income per (city_full, date). Input for
+    metro_index.MetroSeriesIndex and the analytics stage.
+    """
+    return metro_month_matrix(df).metro_series()
+
+
+LATEST_ZIP_COLUMNS = [
+    "zipcode",
+    "city_full",
+    "date",
+    "median_sale_price",
+    "Median Rent",
+    "median_household_income_est",
+    "price_to_income",
+    "rent_to_income",
+]
+
+
+@traced
+def latest_zip_snapshot(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Each ZIP's most recent month that has a sale price: one row per
+    zipcode with price, rent, household income and ratios.
+    """
+    priced = df.loc[df["median_sale_price"].notna(), LATEST_ZIP_COLUMNS]
+    latest = (
+        priced.sort_values(["zipcode", "date"], kind="stable")
+        .drop_duplicates("zipcode", keep="last")
+        .reset_index(drop=True)
+    )
+    latest["city_full"] = latest["city_full"].astype(str)
+    for col in RATIO_COLUMNS[:2]:
+        latest[col] = latest[col].astype("float64")
+    return _decode_dates(latest)
+
+
+@traced
 def affordability_counts_by_year(summary: pd.DataFrame) -> pd.DataFrame:
     """Number of metros in each category per year."""
     counts = (
-        summary.groupby(["year", "affordability_rating"])
+        summary.groupby(["year", "affordability_rating"], observed=True)
         .size()
         .reset_index(name="n_metros")
     )
@@ -152,6 +693,52 @@ def affordability_counts_by_year(summary: pd.DataFrame) -> pd.DataFrame:
     return counts
 
 
+# metros highlighted at each end of the PTI ranking (chapter 2)
+HIGHLIGHT_N = 7
+
+
+@traced
+def year_rankings(summary: pd.DataFrame, n: int = HIGHLIGHT_N) -> pd.DataFrame:
+    """
+    For every year, the n metros with the highest PTI (group "top", rank 1
+    = least affordable) and the n with the lowest (group "bottom", rank 1
+    = most affordable). All years are ranked at once with argpartition
+    over a year-by-metro PTI matrix, so picking a year is a lookup.
+    """
+    pti = summary.pivot(index="year", columns="city_full", values="price_to_income")
+    values = pti.to_numpy(dtype="float64")
+    metros = pti.columns.to_numpy(dtype=object)
+    k = min(n, values.shape[1])
+
+    frames = []
+    for group, sign in (("top", -1.0), ("bottom", 1.0)):
+        # NaN sorts last either way
+        key = np.where(np.isnan(values), np.inf, sign * values)
+        pick = np.argpartition(key, k - 1, axis=1)[:, :k] if k else np.empty((len(pti), 0), int)
+        pick = np.take_along_axis(
+            pick, np.argsort(np.take_along_axis(key, pick, axis=1), axis=1, kind="stable"), axis=1
+        )
+        ranked = np.take_along_axis(values, pick, axis=1)
+        frames.append(pd.DataFrame({
+            "year": np.repeat(pti.index.to_numpy(), k),
+            "group": group,
+            "rank": np.tile(np.arange(1, k + 1), len(pti)),
+            "city_full": metros[pick.ravel()].astype(str),
+            "price_to_income": ranked.ravel(),
+        }))
+    ranks = pd.concat(frames, ignore_index=True).dropna(subset=["price_to_income"])
+    return ranks.sort_values(["year", "group", "rank"], ignore_index=True)
+
+
+def top_bottom_metros(year_ranks: pd.DataFrame, year: int) -> tuple[list, list]:
+    """(top, bottom) metro lists of `year` from a year_rankings table."""
+    ranks = year_ranks[year_ranks["year"] == year]
+    return (
+        ranks.loc[ranks["group"] == "top", "city_full"].tolist(),
+        ranks.loc[ranks["group"] == "bottom", "city_full"].tolist(),
+    )
+
+
 def latest_year(summary: pd.DataFrame) -> int:
     """Return the latest year present in the summary."""
     return int(summary["year"].max())
@@ -0,0 +1,246 @@
+# diagnostics.py
+"""
+Lightweight per-rerun spans for the data pipeline, chart builders and
+chart emission, plus a hidden waterfall panel.
+
+Turn on with the env var HOUSING_DIAGNOSTICS=1 (every session) or the
+query parameter ?diagnostics=1 (one session). When off, a traced call
+costs one context-variable lookup.
+
+Each span records its duration, rows in and out and the size of its
+result (bytes_out). With the env var set, spans also record, from
+tracemalloc, the memory they allocated: alloc_peak, the peak above the
+level at span start, and alloc_net, what is still allocated at the end.
+tracemalloc slows every allocation in the process, so the query
+parameter alone never starts it, and it runs only while a traced rerun
+is in progress. Its counters are process-wide, so spans of concurrent
+reruns see each other's allocations.
+"""
+import functools
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextvars import ContextVar
+
+import pandas as pd
+import plotly.graph_objects as go
+
+# streamlit is imported where it is used, so the pipeline modules that
+# import traced do not need it
+
+ENV_FLAG = "HOUSING_DIAGNOSTICS"
+QUERY_FLAG = "diagnostics"
+MAX_RERUNS = 10
+
+# spans of the rerun in progress on this thread; None when disabled
+_spans: ContextVar[list | None] = ContextVar("diagnostics_spans", default=None)
+_depth: ContextVar[int] = ContextVar("diagnostics_depth", default=0)
+_rerun_start: ContextVar[float] = ContextVar("diagnostics_rerun_start", default=0.0)
+# spans still running, outermost first (their peaks must survive reset_peak)
+_open: ContextVar[tuple] = ContextVar("diagnostics_open", default=())
+
+# threads with a traced rerun in progress; tracemalloc runs while there is one
+_tracing_threads: set[int] = set()
+_tracing_lock = threading.Lock()
+
+
+def _env_enabled() -> bool:
+    return os.environ.get(ENV_FLAG, "") not in ("", "0")
+
+
+def is_enabled() -> bool:
+    if _env_enabled():
+        return True
+    try:
+        import streamlit as st
+
+        return st.query_params.get(QUERY_FLAG) == "1"
+    except Exception:
+        # no script run context (bare python, background threads)
+        return False
+
+
+def _size(obj) -> tuple[int | None, int | None]:
+    """(rows, bytes) of a frame result; (None, None) for anything else."""
+    if isinstance(obj, pd.DataFrame):
+        return len(obj), int(obj.memory_usage(index=True, deep=False).sum())
+    if isinstance(obj, pd.Series):
+        return len(obj), int(obj.memory_usage(index=True, deep=False))
+    return None, None
+
+
+def _set_tracing(on: bool) -> None:
+    """
+    Mark this thread's rerun as traced or not, and run tracemalloc only
+    while some live thread has a traced rerun. Reruns cut short by
+    Streamlit never reach end_rerun; their threads are dropped once they
+    exit or start their next rerun.
+    """
+    with _tracing_lock:
+        if on:
+            _tracing_threads.add(threading.get_ident())
+        else:
+            _tracing_threads.discard(threading.get_ident())
+        _tracing_threads.intersection_update(t.ident for t in threading.enumerate())
+        if _tracing_threads and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        elif not _tracing_threads and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+def _memory() -> tuple[int, int]:
+    """tracemalloc (current, peak) bytes; zeros when it is not running."""
+    return tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+
+
+def _record(name: str, fn, args, kwargs):
+    spans = _spans.get()
+    depth = _depth.get()
+    record = {
+        "name": name,
+        "depth": depth,
+        "start": time.perf_counter() - _rerun_start.get(),
+        "rows_in": _size(args[0])[0] if args else None,
+    }
+    spans.append(record)
+    parents = _open.get()
+    current, peak = _memory()
+    for parent in parents:
+        parent["_peak"] = max(parent["_peak"], peak)
+    if tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+    record["_base"] = record["_peak"] = current
+
+    depth_token = _depth.set(depth + 1)
+    open_token = _open.set(parents + (record,))
+    start = time.perf_counter()
+    try:
+        result = fn(*args, **kwargs)
+    finally:
+        record["duration"] = time.perf_counter() - start
+        _depth.reset(depth_token)
+        _open.reset(open_token)
+        current, peak = _memory()
+        base, peak = record.pop("_base"), max(record.pop("_peak"), peak)
+        tracing = tracemalloc.is_tracing()
+        record["alloc_peak"] = peak - base if tracing else None
+        record["alloc_net"] = current - base if tracing else None
+        for parent in parents:
+            parent["_peak"] = max(parent["_peak"], peak)
+    record["rows_out"], record["bytes_out"] = _size(result)
+    return result
+
+
+def traced(fn=None, *, name: str | None = None):
+    """
+    Decorator recording a span per call while diagnostics are on:
+    duration, rows in (first argument), rows out, bytes of the result and
+    bytes allocated (tracemalloc peak and net, with HOUSING_DIAGNOSTICS).
+    """
+    def decorate(func):
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _spans.get() is None:
+                return func(*args, **kwargs)
+            return _record(label, func, args, kwargs)
+
+        return wrapper
+
+    return decorate(fn) if fn is not None else decorate
+
+
+def plotly_chart(fig, **kwargs):
+    """st.plotly_chart with a span around the emission."""
+    import streamlit as st
+
+    if _spans.get() is None:
+        return st.plotly_chart(fig, **kwargs)
+    title = fig.layout.title.text or "figure"
+    return _record(f"st.plotly_chart: {title[:40]}", st.plotly_chart, (fig,), kwargs)
+
+
+def begin_rerun() -> None:
+    """Call at the top of a page script."""
+    enabled = is_enabled()
+    _set_tracing(enabled and _env_enabled())
+    if enabled:
+        _spans.set([])
+        _rerun_start.set(time.perf_counter())
+    else:
+        _spans.set(None)
+
+
+def end_rerun() -> None:
+    """Call at the end of a page script: files this rerun's spans and draws the panel."""
+    spans = _spans.get()
+    if spans is None:
+        return
+    import streamlit as st
+
+    runs = st.session_state.setdefault("_diagnostics_runs", deque(maxlen=MAX_RERUNS))
+    runs.append({
+        "finished": time.strftime("%H:%M:%S"),
+        "total": time.perf_counter() - _rerun_start.get(),
+        "spans": spans,
+    })
+    _spans.set(None)
+    _set_tracing(False)
+    render_panel(list(runs))
+
+
+def _mib(n: int | None) -> str:
+    return "n/a" if n is None else f"{n / 2**20:.2f} MiB"
+
+
+def waterfall_figure(run: dict) -> go.Figure:
+    spans = run["spans"]
+    labels = [f"{i:02d} {'· ' * s['depth']}{s['name']}" for i, s in enumerate(spans)]
+    hover = [
+        f"{s['duration'] * 1000:.1f} ms<br>rows in: {s['rows_in']}<br>"
+        f"rows out: {s.get('rows_out')}<br>result bytes: {s.get('bytes_out')}<br>"
+        f"allocated (peak): {_mib(s.get('alloc_peak'))}<br>"
+        f"still allocated: {_mib(s.get('alloc_net'))}"
+        for s in spans
+    ]
+    fig = go.Figure(go.Bar(
+        x=[s["duration"] * 1000 for s in spans],
+        base=[s["start"] * 1000 for s in spans],
+        y=labels,
+        orientation="h",
+        hovertext=hover,
+        hoverinfo="text",
+        marker_color=["#1a73e8" if s["depth"] == 0 else "#90CAF9" for s in spans],
+    ))
+    fig.update_layout(
+        title=f"Rerun at {run['finished']} – {run['total'] * 1000:.0f} ms",
+        xaxis_title="ms since rerun start",
+        yaxis=dict(autorange="reversed"),
+        height=max(250, 24 * len(spans) + 100),
+        showlegend=False,
+    )
+    return fig
+
+
+def render_panel(runs: list[dict]) -> None:
+    import streamlit as st
+
+    with st.expander(f"Diagnostics – last {len(runs)} reruns", expanded=False):
+        st.dataframe(
+            pd.DataFrame(
+                [{"finished": r["finished"], "total_ms": round(r["total"] * 1000, 1),
+                  "spans": len(r["spans"])} for r in reversed(runs)]
+            ),
+            hide_index=True,
+        )
+        choice = st.selectbox(
+            "Rerun",
+            range(len(runs)),
+            index=len(runs) - 1,
+            format_func=lambda i: f"{runs[i]['finished']} ({runs[i]['total'] * 1000:.0f} ms)",
+        )
+        st.plotly_chart(waterfall_figure(runs[choice]))
+        st.dataframe(pd.DataFrame(runs[choice]["spans"]), hide_index=True)
@@ -0,0 +1,130 @@
+# downsample.py
+"""
+Largest-Triangle-Three-Buckets (LTTB) downsampling of line series before
+they are turned into figures.
+
+lttb_indices works on every series of a frame at once: it loops over the
+bucket number only, and each step handles that bucket of all series with
+flat array operations. series_budget turns a chart width into a point
+budget per series; chart builders clip to the visible x range first, so
+a narrower range (zooming in) gets back to full resolution.
+"""
+import numpy as np
+import pandas as pd
+
+DEFAULT_CHART_WIDTH = 1200
+# no series gets more points than the chart has pixels, and no chart
+# more than this many points in total
+MAX_POINTS_PER_CHART = 50_000
+MIN_SERIES_POINTS = 24
+
+
+def series_budget(n_series: int, width_px: int = DEFAULT_CHART_WIDTH,
+                  total_points: int = MAX_POINTS_PER_CHART) -> int:
+    """Points per series for a chart `width_px` wide showing `n_series` lines."""
+    return max(MIN_SERIES_POINTS, min(int(width_px), total_points // max(n_series, 1)))
+
+
+def _as_float(values) -> np.ndarray:
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        values = values.astype("datetime64[ns]").astype("int64")
+    values = values.astype("float64")
+    # differences only, so shift near zero for precision
+    return values - np.nanmin(values) if len(values) else values
+
+
+def _ramp(lengths: np.ndarray) -> np.ndarray:
+    """0..len-1 for each length, concatenated."""
+    total = int(lengths.sum())
+    return np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+
+
+def _segment_argmax(values: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Flat position of the (first) maximum of each consecutive segment."""
+    seg_start = np.cumsum(lengths) - lengths
+    best = np.maximum.reduceat(values, seg_start)
+    hit = values == np.repeat(best, lengths)
+    flat = np.arange(len(values))
+    return np.minimum.reduceat(np.where(hit, flat, len(values)), seg_start)
+
+
+def lttb_indices(groups: np.ndarray, x, y, n_out: int) -> np.ndarray:
+    """
+    Sorted positions of the points LTTB keeps, `n_out` per group at most.
+
+    Rows must be sorted by group, then x. Groups no longer than n_out are
+    kept whole; every group keeps its first and last point. Points with
+    NaN y lose to any real point in their bucket.
+    """
+    groups = np.asarray(groups)
+    n = len(groups)
+    if n == 0:
+        return np.arange(0)
+    x = _as_float(x)
+    y = np.asarray(y, dtype="float64")
+
+    first = np.ones(n, dtype=bool)
+    first[1:] = groups[1:] != groups[:-1]
+    starts = np.flatnonzero(first)
+    sizes = np.diff(np.append(starts, n))
+
+    small = sizes <= n_out
+    keep = [np.repeat(starts[small], sizes[small]) + _ramp(sizes[small])]
+
+    s, size = starts[~small], sizes[~small]
+    if len(s) and n_out < 3:
+        keep += [s, s + size - 1]
+    elif len(s):
+        n_buckets = n_out - 2
+        # bucket b of each group covers rows edges[:, b] : edges[:, b + 1]
+        steps = np.arange(n_buckets + 1)[None, :] * (size - 2)[:, None]
+        edges = s[:, None] + 1 + steps // n_buckets
+
+        valid = ~np.isnan(y)
+        csum_x = np.concatenate([[0.0], np.cumsum(x)])
+        csum_y = np.concatenate([[0.0], np.cumsum(np.where(valid, y, 0.0))])
+        csum_n = np.concatenate([[0], np.cumsum(valid)])
+
+        chosen = s.copy()
+        keep.append(s)
+        for b in range(n_buckets):
+            lo, hi = edges[:, b], edges[:, b + 1]
+            if b + 1 < n_buckets:
+                nlo, nhi = hi, edges[:, b + 2]
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    cx = (csum_x[nhi] - csum_x[nlo]) / (nhi - nlo)
+                    cy = (csum_y[nhi] - csum_y[nlo]) / (csum_n[nhi] - csum_n[nlo])
+            else:
+                cx, cy = x[s + size - 1], y[s + size - 1]
+
+            lengths = hi - lo
+            pos = np.repeat(lo, lengths) + _ramp(lengths)
+            ax, ay = np.repeat(x[chosen], lengths), np.repeat(y[chosen], lengths)
+            area = np.abs(
+                (ax - np.repeat(cx, lengths)) * (y[pos] - ay)
+                - (ax - x[pos]) * (np.repeat(cy, lengths) - ay)
+            )
+            area = np.where(np.isnan(area), -1.0, area)
+            chosen = pos[_segment_argmax(area, lengths)]
+            keep.append(chosen)
+        keep.append(s + size - 1)
+
+    return np.sort(np.concatenate(keep))
+
+
+def visible_points(df: pd.DataFrame, x: str, y: str, by: str | None = None,
+                   width_px: int | None = None, x_range: tuple | None = None) -> pd.DataFrame:
+    """
+    Rows of `df` to draw: clipped to x_range, then LTTB-downsampled per
+    `by` series to the budget for width_px (None keeps every point).
+    """
+    if x_range is not None:
+        df = df[(df[x] >= x_range[0]) & (df[x] <= x_range[1])]
+    if width_px is None or df.empty:
+        return df
+    keys = [by, x] if by else [x]
+    df = df.sort_values(keys, kind="stable")
+    groups = pd.factorize(df[by])[0] if by else np.zeros(len(df), dtype="int64")
+    n_out = series_budget(int(groups.max()) + 1, width_px)
+    return df.iloc[lttb_indices(groups, df[x].to_numpy(), df[y].to_numpy(), n_out)]
@@ -0,0 +1,267 @@
+# engines.py
+"""
+Interchangeable aggregation backends for the data_utils group-bys.
+
+Every engine exposes metro_month_matrix, composite_series,
+yearly_metro_summary, metro_pti_series and affordability_counts_by_year
+with the same signatures and outputs as data_utils (the pandas
+reference). The pipeline only groups through metro_month_matrix and
+reduces the matrix for the rest. Pick one
+with the env var HOUSING_AGG_ENGINE = pandas | duckdb | polars.
+DuckDB and Polars are optional, multi-threaded and only imported when
+selected.
+
+Engines take the full-precision add_derived_columns frame; only the
+grouping runs in the backend, the indexing/rating steps are shared.
+"""
+import os
+
+import pandas as pd
+
+import data_utils
+from data_utils import (
+    AFFORDABILITY_ORDER,
+    METRO_SERIES_MEASURES,
+    MetroMonthMatrix,
+    finalize_composite,
+    finalize_metro_summary,
+)
+
+ENGINE_ENV = "HOUSING_AGG_ENGINE"
+DEFAULT_ENGINE = "pandas"
+
+
+class PandasEngine:
+    """The reference implementation in data_utils."""
+    name = "pandas"
+
+    def metro_month_matrix(self, df: pd.DataFrame) -> MetroMonthMatrix:
+        return data_utils.metro_month_matrix(df)
+
+    def composite_series(self, df: pd.DataFrame) -> pd.DataFrame:
+        return data_utils.composite_series(df)
+
+    def yearly_metro_summary(self, df: pd.DataFrame) -> pd.DataFrame:
+        return data_utils.yearly_metro_summary(df)
+
+    def metro_pti_series(self, df: pd.DataFrame) -> pd.DataFrame:
+        return data_utils.metro_pti_series(df)
+
+    def affordability_counts_by_year(self, summary: pd.DataFrame) -> pd.DataFrame:
+        return data_utils.affordability_counts_by_year(summary)
+
+
+def _match_dtypes(out: pd.DataFrame, df: pd.DataFrame) -> pd.DataFrame:
+    """Give key columns the dtypes the pandas groupby would keep."""
+    for col in ("date", "year", "city_full"):
+        if col in out.columns and col in df.columns:
+            out[col] = out[col].astype(df[col].dtype)
+    return out
+
+
+def _matrix(cells: pd.DataFrame, df: pd.DataFrame) -> MetroMonthMatrix:
+    """MetroMonthMatrix from per-(city_full, date) "<measure>:<stat>" columns."""
+    partials = _match_dtypes(cells, df).set_index(["city_full", "date"])
+    partials.columns = pd.MultiIndex.from_tuples(
+        [tuple(c.split(":", 1)) for c in partials.columns]
+    )
+    # a sum over no values is NULL in SQL, 0 in the matrix
+    return MetroMonthMatrix.from_partials(partials.fillna(0))
+
+
+def _rated_counts(counts: pd.DataFrame) -> pd.DataFrame:
+    counts["affordability_rating"] = pd.Categorical(
+        counts["affordability_rating"],
+        categories=AFFORDABILITY_ORDER,
+        ordered=True,
+    )
+    return counts.sort_values(["year", "affordability_rating"])
+
+
+class DuckDBEngine:
+    """In-process DuckDB over the pandas frames (no copy for numeric columns)."""
+    name = "duckdb"
+
+    def __init__(self, threads: int | None = None):
+        import duckdb
+
+        self.con = duckdb.connect()
+        if threads:
+            self.con.execute(f"SET threads = {int(threads)}")
+
+    def _query(self, sql: str, **frames) -> pd.DataFrame:
+        cursor = self.con.cursor()
+        for name, frame in frames.items():
+            cursor.register(name, frame)
+        try:
+            return cursor.execute(sql).df()
+        finally:
+            cursor.close()
+
+    def metro_month_matrix(self, df: pd.DataFrame) -> MetroMonthMatrix:
+        stats = ", ".join(
+            f'sum({m}) AS "{m}:sum", count({m}) AS "{m}:count"' for m in METRO_SERIES_MEASURES
+        )
+        cells = self._query(
+            f"""
+            SELECT city_full, date, {stats}, count(*) AS "rows:count"
+            FROM t WHERE date IS NOT NULL
+            GROUP BY city_full, date
+            """,
+            t=df[["city_full", "date", *METRO_SERIES_MEASURES]],
+        )
+        return _matrix(cells, df)
+
+    def composite_series(self, df: pd.DataFrame) -> pd.DataFrame:
+        grouped = self._query(
+            """
+            SELECT date,
+                   avg(median_sale_price)           AS composite_price,
+                   avg(median_household_income_est) AS composite_income,
+                   avg(price_to_income)             AS composite_pti
+            FROM t GROUP BY date ORDER BY date
+            """,
+            t=df[["date", "median_sale_price", "median_household_income_est", "price_to_income"]],
+        )
+        return finalize_composite(_match_dtypes(grouped, df))
+
+    def yearly_metro_summary(self, df: pd.DataFrame) -> pd.DataFrame:
+        summary = self._query(
+            """
+            SELECT city_full, year,
+                   avg(price_to_income) AS price_to_income,
+                   avg(rent_to_income)  AS rent_to_income
+            FROM t WHERE city_full IS NOT NULL
+            GROUP BY city_full, year ORDER BY city_full, year
+            """,
+            t=df[["city_full", "year", "price_to_income", "rent_to_income"]],
+        )
+        return finalize_metro_summary(_match_dtypes(summary, df))
+
+    def metro_pti_series(self, df: pd.DataFrame) -> pd.DataFrame:
+        out = self._query(
+            """
+            SELECT city_full, year, date, avg(price_to_income) AS price_to_income
+            FROM t WHERE city_full IS NOT NULL
+            GROUP BY city_full, year, date
+            HAVING avg(price_to_income) IS NOT NULL
+            ORDER BY city_full, year, date
+            """,
+            t=df[["city_full", "year", "date", "price_to_income"]],
+        )
+        return _match_dtypes(out, df)
+
+    def affordability_counts_by_year(self, summary: pd.DataFrame) -> pd.DataFrame:
+        counts = self._query(
+            """
+            SELECT year, affordability_rating, count(*) AS n_metros
+            FROM t WHERE affordability_rating IS NOT NULL
+            GROUP BY year, affordability_rating
+            """,
+            t=summary[["year", "affordability_rating"]].astype({"affordability_rating": object}),
+        )
+        counts["n_metros"] = counts["n_metros"].astype("int64")
+        return _rated_counts(_match_dtypes(counts, summary))
+
+
+class PolarsEngine:
+    """Polars lazy group-bys; NaN is mapped to null so means skip it like pandas."""
+    name = "polars"
+
+    def __init__(self):
+        import polars
+
+        self.pl = polars
+
+    def _frame(self, df: pd.DataFrame, columns: list[str]):
+        return self.pl.from_pandas(df[columns], nan_to_null=True).lazy()
+
+    def _mean_by(self, df, keys, measures):
+        pl = self.pl
+        return (
+            self._frame(df, keys + measures)
+            .drop_nulls(keys)
+            .group_by(keys)
+            .agg([pl.col(m).mean() for m in measures])
+            .sort(keys)
+            .collect()
+            .to_pandas()
+        )
+
+    def metro_month_matrix(self, df: pd.DataFrame) -> MetroMonthMatrix:
+        pl = self.pl
+        keys = ["city_full", "date"]
+        stats = [pl.len().alias("rows:count")]
+        for m in METRO_SERIES_MEASURES:
+            stats += [pl.col(m).sum().alias(f"{m}:sum"), pl.col(m).count().alias(f"{m}:count")]
+        cells = (
+            self._frame(df, keys + METRO_SERIES_MEASURES)
+            .drop_nulls("date")
+            .group_by(keys)
+            .agg(stats)
+            .collect()
+            .to_pandas()
+        )
+        return _matrix(cells, df)
+
+    def composite_series(self, df: pd.DataFrame) -> pd.DataFrame:
+        grouped = self._mean_by(
+            df, ["date"], ["median_sale_price", "median_household_income_est", "price_to_income"]
+        ).rename(
+            columns={
+                "median_sale_price": "composite_price",
+                "median_household_income_est": "composite_income",
+                "price_to_income": "composite_pti",
+            }
+        )
+        return finalize_composite(_match_dtypes(grouped, df))
+
+    def yearly_metro_summary(self, df: pd.DataFrame) -> pd.DataFrame:
+        summary = self._mean_by(df, ["city_full", "year"], ["price_to_income", "rent_to_income"])
+        return finalize_metro_summary(_match_dtypes(summary, df))
+
+    def metro_pti_series(self, df: pd.DataFrame) -> pd.DataFrame:
+        out = self._mean_by(df, ["city_full", "year", "date"], ["price_to_income"])
+        out = out.dropna(subset=["price_to_income"]).reset_index(drop=True)
+        return _match_dtypes(out, df)
+
+    def affordability_counts_by_year(self, summary: pd.DataFrame) -> pd.DataFrame:
+        pl = self.pl
+        counts = (
+            pl.from_pandas(summary[["year"]].assign(
+                affordability_rating=summary["affordability_rating"].astype(object)
+            ))
+            .lazy()
+            .drop_nulls("affordability_rating")
+            .group_by(["year", "affordability_rating"])
+            .agg(pl.len().alias("n_metros"))
+            .collect()
+            .to_pandas()
+        )
+        counts["n_metros"] = counts["n_metros"].astype("int64")
+        return _rated_counts(_match_dtypes(counts, summary))
+
+
+ENGINES = {
+    "pandas": PandasEngine,
+    "duckdb": DuckDBEngine,
+    "polars": PolarsEngine,
+}
+
+_instances: dict[str, object] = {}
+
+
+def get_engine(name: str | None = None):
+    """Engine by name, else from HOUSING_AGG_ENGINE, else pandas."""
+    name = (name or os.environ.get(ENGINE_ENV) or DEFAULT_ENGINE).lower()
+    if name not in ENGINES:
+        raise ValueError(f"Unknown aggregation engine {name!r}; choose from {sorted(ENGINES)}")
+    if name not in _instances:
+        try:
+            _instances[name] = ENGINES[name]()
+        except ImportError as exc:
+            raise ImportError(
+                f"Aggregation engine {name!r} needs the {exc.name!r} package "
+                f"(pip install {exc.name})"
+            ) from exc
+    return _instances[name]
@@ -0,0 +1,213 @@
+# export.py
+"""
+Render every chapter to static files.
+
+    python -m export [--out site] [--data data/HouseTS_reduced.csv]
+                     [--snapshot data/snapshot] [--workers N] [--force]
+
+Writes figures/<name>.html (standalone, Plotly from CDN) and
+figures/<name>.json for each chapter figure, chapters.json with the
+chapter text, an index.html tying them together, and manifest.json
+with input and content hashes. Figures whose inputs, builder code
+(the FIGURE_MODULES and the Plotly version) and output files are
+unchanged since the last export are skipped; the rest are built in a
+process pool.
+"""
+import argparse
+import hashlib
+import html
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import plotly
+
+import chapters
+import charts
+import data_utils
+import downsample
+from chapters import CHAPTERS, FOCUS_YEAR, highlight_text
+from data_utils import read_ingested
+from figure_cache import fingerprint
+from pipeline import (
+    DEFAULT_DATA_PATH,
+    DEFAULT_SNAPSHOT_DIR,
+    build_derived,
+    read_snapshot,
+    read_snapshot_manifest,
+)
+
+DEFAULT_OUT_DIR = "site"
+MANIFEST = "manifest.json"
+
+# modules whose code decides what an exported figure looks like
+FIGURE_MODULES = (charts, chapters, data_utils, downsample)
+
+
+def _file_hash(path: str) -> str | None:
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _code_version() -> str:
+    """Hash of the FIGURE_MODULES and the Plotly version, so a change to
+    either invalidates exported figures."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"plotly {plotly.__version__}".encode())
+    for module in FIGURE_MODULES:
+        digest.update(f"{module.__name__} {_file_hash(module.__file__)}".encode())
+    return digest.hexdigest()
+
+
+def _render_figure(spec, inputs: dict, out_dir: str, name: str) -> dict:
+    """Process-pool worker: build one figure and write its HTML and JSON."""
+    fig = spec.build(inputs)
+    html_path = os.path.join(out_dir, "figures", f"{name}.html")
+    json_path = os.path.join(out_dir, "figures", f"{name}.json")
+    fig.write_html(html_path, include_plotlyjs="cdn", full_html=True)
+    with open(json_path, "w") as fh:
+        fh.write(fig.to_json())
+    return {"html": _file_hash(html_path), "json": _file_hash(json_path)}
+
+
+def load_export_data(data_path: str, snapshot_dir: str):
+    """Aggregates from the snapshot when there is one, else the full pipeline."""
+    if read_snapshot_manifest(snapshot_dir) is not None:
+        return read_snapshot(snapshot_dir)
+    return build_derived(read_ingested(data_path))
+
+
+def _index_html(chapters_doc: list[dict]) -> str:
+    def markdown(block: str) -> str:
+        # raw markdown in a non-executed script tag, rendered client-side
+        return f'<script type="text/markdown">{block}</script>'
+
+    sections = []
+    for chapter in chapters_doc:
+        intro, *rest = chapter["text"]
+        frames = "".join(
+            f'<iframe src="{fig["html"]}" loading="lazy"></iframe>' for fig in chapter["figures"]
+        )
+        sections.append(
+            f'<section id="{chapter["key"]}"><h2>{html.escape(chapter["title"])}</h2>'
+            f'{markdown(intro)}{frames}{"".join(markdown(block) for block in rest)}</section>'
+        )
+
+    return f"""<!doctype html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Housing Affordability Story</title>
+<script src="https://cdn.jsdelivr.net/npm/marked/marked.min.js"></script>
+<style>
+body {{ font-family: -apple-system, "Segoe UI", Roboto, Helvetica, Arial, sans-serif; max-width: 1100px; margin: auto; }}
+iframe {{ width: 100%; height: 560px; border: 1px solid #e5e5e5; border-radius: 8px; }}
+section {{ margin-bottom: 3rem; }}
+</style>
+</head>
+<body>
+<h1>Housing Affordability Explorer - Overview</h1>
+{"".join(sections)}
+<script>
+document.querySelectorAll('script[type="text/markdown"]').forEach(el => {{
+  const div = document.createElement("div");
+  div.innerHTML = marked.parse(el.textContent);
+  el.replaceWith(div);
+}});
+</script>
+</body>
+</html>
+"""
+
+
+def export(out_dir: str, data, workers: int | None = None, force: bool = False) -> dict:
+    os.makedirs(os.path.join(out_dir, "figures"), exist_ok=True)
+    manifest_path = os.path.join(out_dir, MANIFEST)
+    previous = {}
+    if os.path.exists(manifest_path) and not force:
+        with open(manifest_path) as fh:
+            previous = json.load(fh).get("figures", {})
+
+    code_version = _code_version()
+    entries, jobs, chapters_doc = {}, {}, []
+
+    for chapter in CHAPTERS:
+        inputs = chapter.inputs(data)
+        doc = {"key": chapter.key, "title": chapter.title, "text": list(chapter.text), "figures": []}
+        if chapter.key == "divergence":
+            doc["text"].append(highlight_text(data.year_ranks, FOCUS_YEAR))
+
+        for i, spec in enumerate(chapter.figures):
+            name = f"{chapter.key}-{i + 1}-{spec.builder}"
+            spec_inputs = {arg: inputs[arg] for arg in spec.args}
+            input_hash = fingerprint((spec.builder, spec_inputs, spec.kwargs, code_version))
+            entry = {"chapter": chapter.key, "builder": spec.builder, "input_hash": input_hash}
+
+            old = previous.get(name)
+            unchanged = (
+                old is not None
+                and old["input_hash"] == input_hash
+                and _file_hash(os.path.join(out_dir, "figures", f"{name}.html")) == old["files"]["html"]
+                and _file_hash(os.path.join(out_dir, "figures", f"{name}.json")) == old["files"]["json"]
+            )
+            if unchanged:
+                entry["files"] = old["files"]
+            else:
+                jobs[name] = (spec, spec_inputs)
+            entries[name] = entry
+            doc["figures"].append({"html": f"figures/{name}.html", "json": f"figures/{name}.json"})
+        chapters_doc.append(doc)
+
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                name: pool.submit(_render_figure, spec, spec_inputs, out_dir, name)
+                for name, (spec, spec_inputs) in jobs.items()
+            }
+            for name, future in futures.items():
+                entries[name]["files"] = future.result()
+
+    with open(os.path.join(out_dir, "chapters.json"), "w") as fh:
+        json.dump(chapters_doc, fh, indent=2, ensure_ascii=False)
+    with open(os.path.join(out_dir, "index.html"), "w") as fh:
+        fh.write(_index_html(chapters_doc))
+
+    manifest = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "code_version": code_version,
+        "figures": entries,
+        "chapters": _file_hash(os.path.join(out_dir, "chapters.json")),
+    }
+    with open(manifest_path, "w") as fh:
+        json.dump(manifest, fh, indent=2)
+
+    return {"built": sorted(jobs), "skipped": sorted(set(entries) - set(jobs))}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--out", default=DEFAULT_OUT_DIR)
+    parser.add_argument("--data", default=DEFAULT_DATA_PATH)
+    parser.add_argument("--snapshot", default=DEFAULT_SNAPSHOT_DIR)
+    parser.add_argument("--workers", type=int, default=None, help="process pool size")
+    parser.add_argument("--force", action="store_true", help="rebuild every figure")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    data = load_export_data(args.data, args.snapshot)
+    result = export(args.out, data, workers=args.workers, force=args.force)
+    print(
+        f"Exported to {args.out} in {time.perf_counter() - start:.1f}s: "
+        f"{len(result['built'])} built, {len(result['skipped'])} unchanged"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
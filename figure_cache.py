@@ -0,0 +1,182 @@
+# figure_cache.py
+import functools
+import hashlib
+import inspect
+import threading
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_MAXSIZE = 32
+# prefetch keys remembered, so a pending or finished job is not queued again
+PREFETCH_MEMORY = 64
+
+# id(frame) -> (weakref, label, columns, shape) for label_frame
+_labels: dict[int, tuple] = {}
+_labels_lock = threading.Lock()
+
+
+def label_frame(frame: pd.DataFrame, label: str) -> None:
+    """
+    Let cached_figure key `frame` by `label` instead of hashing its
+    content on every call. Only for frames that are never modified, such
+    as those of a frozen DerivedData labelled with its version; the label
+    is dropped if the frame's columns or length change.
+    """
+    key = id(frame)
+
+    def forget(ref, key=key):
+        with _labels_lock:
+            if _labels.get(key, (None,))[0] is ref:
+                del _labels[key]
+
+    entry = (weakref.ref(frame, forget), label, tuple(frame.columns), frame.shape)
+    with _labels_lock:
+        _labels[key] = entry
+
+
+def _label(frame: pd.DataFrame) -> str | None:
+    entry = _labels.get(id(frame))
+    if entry is None:
+        return None
+    ref, label, columns, shape = entry
+    if ref() is not frame or frame.shape != shape or tuple(frame.columns) != columns:
+        return None
+    return label
+
+
+def fingerprint(value, use_labels: bool = False) -> str:
+    """
+    Stable content hash of a builder argument (frames hashed by value).
+    With use_labels, frames registered with label_frame contribute their
+    label instead (cheap, but only meaningful within this process).
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    _update(digest, value, use_labels)
+    return digest.hexdigest()
+
+
+def _update(digest, value, use_labels: bool = False) -> None:
+    if isinstance(value, pd.DataFrame):
+        label = _label(value) if use_labels else None
+        if label is not None:
+            digest.update(f"frame:{label}".encode())
+            return
+        digest.update(repr((list(value.columns), [str(t) for t in value.dtypes])).encode())
+        digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    elif isinstance(value, pd.Series):
+        digest.update(repr((value.name, str(value.dtype))).encode())
+        digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    elif isinstance(value, np.ndarray):
+        digest.update(repr((value.dtype.str, value.shape)).encode())
+        digest.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, (list, tuple)):
+        digest.update(f"{type(value).__name__}:{len(value)}".encode())
+        for item in value:
+            _update(digest, item, use_labels)
+    elif isinstance(value, dict):
+        for key in sorted(value, key=repr):
+            digest.update(repr(key).encode())
+            _update(digest, value[key], use_labels)
+    else:
+        digest.update(repr(value).encode())
+
+
+class FigureCache:
+    """Thread-safe LRU of built figures, shared by all sessions."""
+
+    def __init__(self, maxsize: int = DEFAULT_MAXSIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._items: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, fig) -> None:
+        with self._lock:
+            self._items[key] = fig
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+figure_cache = FigureCache()
+
+
+def cached_figure(builder):
+    """
+    Memoize a chart builder on (builder name, argument fingerprints).
+    Frames labelled with label_frame (the shared DerivedData) are keyed by
+    their label, so a cache hit does not rehash them.
+
+    The cached figure object is shared between callers, so it must be
+    treated as read-only (st.plotly_chart only serializes it).
+    """
+    signature = inspect.signature(builder)
+
+    @functools.wraps(builder)
+    def wrapper(*args, **kwargs):
+        # bound with defaults, so f(x), f(x, y=None) and f(x=x) share a key
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        key = (builder.__qualname__, fingerprint(dict(bound.arguments), use_labels=True))
+        fig = figure_cache.get(key)
+        if fig is None:
+            fig = builder(*args, **kwargs)
+            figure_cache.put(key, fig)
+        return fig
+
+    wrapper.uncached = builder
+    return wrapper
+
+
+# single worker: prefetching is opportunistic and must not compete with
+# the foreground rerun for more than one core
+_prefetch_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="figure-prefetch")
+_prefetched: OrderedDict = OrderedDict()
+_prefetch_lock = threading.Lock()
+
+
+def prefetch(build, *args, key=None, **kwargs):
+    """
+    Run `build(*args, **kwargs)` in the background so the figures it makes
+    through cached_figure builders are in the cache before they are asked
+    for. Errors are left on the returned future, never raised here.
+
+    With a `key` (e.g. data version + chapter), a job whose key is already
+    pending or has succeeded is not queued again; its future is returned.
+    """
+    if key is None:
+        return _prefetch_pool.submit(build, *args, **kwargs)
+    with _prefetch_lock:
+        future = _prefetched.get(key)
+        failed = future is not None and future.done() and (
+            future.cancelled() or future.exception() is not None
+        )
+        if future is None or failed:
+            future = _prefetch_pool.submit(build, *args, **kwargs)
+            _prefetched[key] = future
+        _prefetched.move_to_end(key)
+        while len(_prefetched) > PREFETCH_MEMORY:
+            _prefetched.popitem(last=False)
+        return future
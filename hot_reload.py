@@ -0,0 +1,192 @@
+# hot_reload.py
+"""
+Serve DerivedData from a double buffer that is rebuilt in the background
+when the source CSV or the precomputed snapshot changes.
+
+A watcher thread polls every HOUSING_RELOAD_INTERVAL seconds (default 5,
+0 disables it): the data file's size/mtime and the snapshot manifest's
+identity (created, source_fingerprint, appends), so `precompute` and
+`precompute --append` are picked up too, also in snapshot-only
+deployments. A change must be seen on two consecutive polls before the
+file is fingerprinted, and only a new fingerprint or manifest triggers a
+rebuild (through load_app_data, so the usual caches apply).
+
+Replace the data file atomically (write a temporary file next to it,
+then rename it over the old one). The debounce keeps a slow in-place
+copy from being loaded half-written in most cases, but it cannot tell a
+paused writer from a finished one. Prepare hooks (e.g.
+warm-up of indexes and figures) run on the new data before it replaces
+the active buffer in a single reference swap; the previous version stays
+as the standby buffer.
+
+A rerun reads current_data() once and keeps that object, so it never
+mixes versions; sessions see the new data on their next rerun.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from data_utils import AVERAGE_HOUSEHOLD_SIZE
+from pipeline import (
+    DEFAULT_DATA_PATH,
+    DEFAULT_SNAPSHOT_DIR,
+    DerivedData,
+    load_app_data,
+    read_snapshot_manifest,
+    source_fingerprint,
+)
+
+RELOAD_INTERVAL_ENV = "HOUSING_RELOAD_INTERVAL"
+DEFAULT_RELOAD_INTERVAL = 5.0
+
+logger = logging.getLogger(__name__)
+
+_rebuild_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="data-reload")
+
+
+class DataStore:
+    """Active + standby DerivedData for one source file, swapped atomically."""
+
+    def __init__(self, path: str = DEFAULT_DATA_PATH,
+                 snapshot_dir: str = DEFAULT_SNAPSHOT_DIR,
+                 household_size: float = AVERAGE_HOUSEHOLD_SIZE):
+        self.path = path
+        self.snapshot_dir = snapshot_dir
+        self.household_size = household_size
+        self.active: DerivedData | None = None
+        self.standby: DerivedData | None = None
+        self.swaps = 0
+        self._stamp: tuple | None = None
+        self._pending: tuple | None = None
+        self._fingerprint: tuple | None = None
+        self._hooks = []
+        self._rebuild: Future | None = None
+        self._lock = threading.Lock()
+
+    def _snapshot_identity(self) -> tuple | None:
+        manifest = read_snapshot_manifest(self.snapshot_dir)
+        if manifest is None:
+            return None
+        return (
+            manifest.get("created"),
+            manifest.get("source_fingerprint"),
+            tuple(manifest.get("appends", [])),
+        )
+
+    def _stat(self) -> tuple:
+        """Cheap change check: (size, mtime_ns) of the file, snapshot identity."""
+        try:
+            stat = os.stat(self.path)
+            file_stat = (stat.st_size, stat.st_mtime_ns)
+        except OSError:
+            file_stat = None
+        return file_stat, self._snapshot_identity()
+
+    def _identify(self, stamp: tuple) -> tuple:
+        """(content fingerprint of the file, snapshot identity) for a stamp."""
+        file_stat, snapshot = stamp
+        if file_stat is None:
+            return None, snapshot
+        manifest = read_snapshot_manifest(self.snapshot_dir)
+        return source_fingerprint(self.path, manifest), snapshot
+
+    def _load(self) -> tuple[DerivedData, tuple, tuple]:
+        stamp = self._stat()
+        fingerprint = self._identify(stamp)
+        data = load_app_data(self.path, self.snapshot_dir, self.household_size)
+        return data, stamp, fingerprint
+
+    def current(self) -> DerivedData:
+        """The active version; the very first call builds it (once)."""
+        data = self.active
+        if data is None:
+            with self._lock:
+                if self.active is None:
+                    self.active, self._stamp, self._fingerprint = self._load()
+                data = self.active
+        return data
+
+    def add_prepare_hook(self, hook) -> None:
+        """hook(data) runs on each rebuilt version before it goes live."""
+        self._hooks.append(hook)
+
+    def check(self) -> Future | None:
+        """
+        Start a background rebuild if the file's content or the snapshot
+        has changed, and the change was already seen on the previous check.
+        """
+        stamp = self._stat()
+        if self.active is None or stamp == self._stamp or stamp == (None, None):
+            self._pending = None
+            return None
+        if stamp != self._pending:
+            # still being written? wait for one more poll with the same stat
+            self._pending = stamp
+            return None
+        self._pending = None
+        if self._identify(stamp) == self._fingerprint:
+            # touched, not changed
+            self._stamp = stamp
+            return None
+        with self._lock:
+            if self._rebuild is None or self._rebuild.done():
+                self._rebuild = _rebuild_pool.submit(self._rebuild_and_swap)
+            return self._rebuild
+
+    def _rebuild_and_swap(self) -> DerivedData:
+        start = time.perf_counter()
+        stamp = self._stat()
+        try:
+            data, stamp, fingerprint = self._load()
+            for hook in self._hooks:
+                hook(data)
+        except Exception:
+            # keep serving the active version; retry once the file changes again
+            self._stamp = stamp
+            logger.exception("Reloading %s failed", self.path)
+            raise
+        with self._lock:
+            self.standby, self.active = self.active, data
+            self._stamp, self._fingerprint = stamp, fingerprint
+            self.swaps += 1
+        logger.info("Reloaded %s in %.1fs (version %s)", self.path,
+                    time.perf_counter() - start, data.version)
+        return data
+
+
+data_store = DataStore()
+
+_watcher: threading.Thread | None = None
+_watcher_lock = threading.Lock()
+
+
+def current_data() -> DerivedData:
+    """Data for this rerun: call once per rerun and keep the result."""
+    return data_store.current()
+
+
+def _watch(interval: float) -> None:
+    while True:
+        time.sleep(interval)
+        try:
+            data_store.check()
+        except Exception:
+            logger.exception("Checking %s for changes failed", data_store.path)
+
+
+def start_watcher(interval: float | None = None) -> threading.Thread | None:
+    """Poll the data file from a daemon thread (once per process)."""
+    global _watcher
+    if interval is None:
+        interval = float(os.environ.get(RELOAD_INTERVAL_ENV, DEFAULT_RELOAD_INTERVAL))
+    if interval <= 0:
+        return None
+    with _watcher_lock:
+        if _watcher is None:
+            _watcher = threading.Thread(
+                target=_watch, args=(interval,), name="data-watcher", daemon=True
+            )
+            _watcher.start()
+    return _watcher
@@ -0,0 +1,58 @@
+# metro_index.py
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from data_utils import RATIO_COLUMNS
+
+MEASURE_LABELS = {
+    "price_to_income": "Price-to-Income",
+    "rent_to_income": "Rent-to-Income",
+    "price_to_rent": "Price-to-Rent",
+}
+
+
+class MetroSeriesIndex:
+    """
+    Metro-by-month ratios (metro_monthly_series) as contiguous arrays.
+
+    Rows are ordered by (metro, date), so each metro's history is one
+    slice of every array; series() returns views of those slices. Picking
+    metros costs a dict lookup each, independent of the table size.
+    """
+
+    def __init__(self, metro_series: pd.DataFrame):
+        metro = metro_series["city_full"].astype(str).astype("category")
+        codes = metro.cat.codes.to_numpy(dtype="int64")
+        dates = metro_series["date"].to_numpy(dtype="datetime64[ns]")
+
+        order = np.lexsort((dates, codes))
+        self.metros = list(metro.cat.categories)
+        self.dates = dates[order]
+        self.values = {
+            m: metro_series[m].to_numpy(dtype="float64")[order] for m in RATIO_COLUMNS
+        }
+
+        bounds = np.searchsorted(codes[order], np.arange(len(self.metros) + 1))
+        self._slices = {
+            name: slice(int(bounds[i]), int(bounds[i + 1]))
+            for i, name in enumerate(self.metros)
+        }
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def series(self, metro: str, measure: str = "price_to_income") -> tuple[np.ndarray, np.ndarray]:
+        """(dates, values) of one metro, as views into the index arrays."""
+        rows = self._slices[metro]
+        return self.dates[rows], self.values[measure][rows]
+
+    def compare(self, metros: list[str], measure: str = "price_to_income") -> dict:
+        """{metro: (dates, values)} for the selected metros."""
+        return {name: self.series(name, measure) for name in metros}
+
+
+@st.cache_resource(show_spinner="Indexing metro time series …", max_entries=2)
+def get_metro_index(version: str, _metro_series: pd.DataFrame) -> MetroSeriesIndex:
+    """One shared index per data version (the frame itself is not hashed)."""
+    return MetroSeriesIndex(_metro_series)
@@ -1,7 +1,14 @@
 import streamlit as st
 from streamlit.components.v1 import html
 
+from charts import metro_series_comparison
+from metro_index import MEASURE_LABELS, get_metro_index
+from hot_reload import current_data
+from price_finder import get_price_index
+from warmup import start_warmup
+
 st.set_page_config(layout="wide")
+start_warmup()
 
 st.markdown("""
 <style>
@@ -118,11 +125,71 @@ elif current_page == "Map":
 
 elif current_page == "TimeSeries":
     st.title("📊 Time Series Comparison")
-    st.write("Your time series charts go here.")
+
+    data = current_data()
+    index = get_metro_index(data.version, data.metro_series)
+
+    col_metros, col_measure = st.columns([2.4, 1])
+    with col_metros:
+        metros = st.multiselect("Metros", index.metros, default=index.metros[:3])
+    with col_measure:
+        measure = st.radio(
+            "Measure", list(MEASURE_LABELS), format_func=MEASURE_LABELS.get, horizontal=True,
+        )
+
+    if metros:
+        st.plotly_chart(
+            metro_series_comparison(index.compare(metros, measure), MEASURE_LABELS[measure]),
+            use_container_width=True,
+        )
+    else:
+        st.info("Pick one or more metros to compare.")
 
 elif current_page == "PriceFinder":
     st.title("💰 Price Affordability Finder")
-    st.write("Income → affordable zip map, etc.")
+
+    data = current_data()
+    index = get_price_index(data.version, data.latest_zips)
+
+    col_income, col_multiple, col_metro = st.columns([1, 1, 1.4])
+    with col_income:
+        income = st.number_input(
+            "Household income ($/year)", min_value=10_000, max_value=2_000_000,
+            value=75_000, step=5_000,
+        )
+    with col_multiple:
+        multiple = st.slider(
+            "Max price as a multiple of income", min_value=1.0, max_value=10.0,
+            value=3.0, step=0.1, help="3.0 is the Demographia 'Affordable' cutoff",
+        )
+    with col_metro:
+        metro = st.selectbox("Metro", ["All metros"] + index.metros)
+    metro = None if metro == "All metros" else metro
+
+    rows = index.query(income, multiple, metro)
+    pool = len(index) if metro is None else index.metro_size(metro)
+
+    st.metric(
+        f"ZIPs priced at or below ${income * multiple:,.0f}",
+        f"{len(rows):,} of {pool:,}",
+    )
+
+    if metro is None:
+        by_metro = index.counts_by_metro(income, multiple).sort_values("share", ascending=False)
+        st.bar_chart(by_metro.set_index("city_full")["share"], horizontal=True)
+
+    # most expensive ZIPs that still fit the budget first
+    st.dataframe(
+        index.frame(rows[::-1][:500]),
+        hide_index=True,
+        column_config={
+            "Median sale price": st.column_config.NumberColumn(format="$%,.0f"),
+            "Median rent": st.column_config.NumberColumn(format="$%,.0f"),
+            "Household income (est.)": st.column_config.NumberColumn(format="$%,.0f"),
+            "PTI": st.column_config.NumberColumn(format="%.2f"),
+            "Month": st.column_config.DateColumn(format="YYYY-MM"),
+        },
+    )
 
 elif current_page == "Story":
     st.title("📖 Housing Affordability Story")
@@ -0,0 +1,368 @@
+# pipeline.py
+import hashlib
+import json
+import os
+import shutil
+import time
+from dataclasses import dataclass, fields, replace
+
+import pandas as pd
+import streamlit as st
+
+from aggregates import AggregateAccumulator
+from analytics import metro_month_analytics, metro_year_analytics
+from diagnostics import traced
+from engines import get_engine
+from figure_cache import label_frame
+from data_utils import (
+    AVERAGE_HOUSEHOLD_SIZE,
+    iter_raw_chunks,
+    read_ingested,
+    add_derived_columns,
+    compact_frame,
+    finalize_payment_grid,
+    freeze_frame,
+    affordability_counts_by_year,
+    latest_year,
+    latest_zip_snapshot,
+    payment_to_income_partials,
+    year_rankings,
+)
+
+DEFAULT_DATA_PATH = "data/HouseTS_reduced.csv"
+DEFAULT_SNAPSHOT_DIR = "data/snapshot"
+
+# bump when the set or layout of snapshot tables changes
+SNAPSHOT_VERSION = 9
+SNAPSHOT_TABLES = [
+    "comp", "summary", "counts", "metro_pti", "metro_series", "latest_zips",
+    "metro_trends", "metro_rolling", "year_ranks", "payment_grid",
+]
+
+# (path, size, mtime_ns) -> content hash, so an unchanged file is hashed once
+_fingerprints: dict[tuple, str] = {}
+
+
+def file_fingerprint(path: str) -> str:
+    """Content hash (blake2b) of a file, memoized on its size/mtime."""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if key not in _fingerprints:
+        digest = hashlib.blake2b(digest_size=16)
+        with open(path, "rb") as fh:
+            for block in iter(lambda: fh.read(1 << 20), b""):
+                digest.update(block)
+        _fingerprints[key] = digest.hexdigest()
+    return _fingerprints[key]
+
+
+def file_stat(path: str) -> list[int]:
+    """[size, mtime_ns] of a file, as recorded in snapshot manifests."""
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def source_fingerprint(path: str, manifest: dict | None) -> str:
+    """
+    file_fingerprint(path), taken from a snapshot manifest without reading
+    the file when its size/mtime are still the ones recorded there.
+    """
+    if manifest is not None and manifest.get("source_stat") == file_stat(path):
+        return manifest["source_fingerprint"]
+    return file_fingerprint(path)
+
+
+@dataclass(frozen=True)
+class DerivedData:
+    """
+    Every aggregate the pages read, plus the derived ZIP-level frame from
+    build_derived (df is None for the shared, serve-time instances and
+    for snapshots: no page reads it). `version`
+    identifies the data the aggregates came from, for keying caches.
+
+    Instances returned by load_derived / load_app_data are shared by all
+    sessions and their frames are read-only (see freeze_derived).
+    """
+    comp: pd.DataFrame
+    summary: pd.DataFrame
+    counts: pd.DataFrame
+    metro_pti: pd.DataFrame
+    metro_series: pd.DataFrame
+    latest_zips: pd.DataFrame
+    metro_trends: pd.DataFrame
+    metro_rolling: pd.DataFrame
+    year_ranks: pd.DataFrame
+    payment_grid: pd.DataFrame
+    year_latest: int
+    df: pd.DataFrame | None = None
+    version: str = ""
+
+
+def freeze_derived(data: DerivedData) -> DerivedData:
+    """
+    DerivedData with every frame passed through data_utils.freeze_frame.
+    With a version, the frames are also labelled "<version>:<field>" for
+    the figure cache (figure_cache.label_frame), so chart builders are
+    keyed on the version instead of rehashing the frames.
+    """
+    frozen = {
+        f.name: freeze_frame(getattr(data, f.name))
+        for f in fields(data)
+        if isinstance(getattr(data, f.name), pd.DataFrame)
+    }
+    if data.version:
+        for name, frame in frozen.items():
+            label_frame(frame, f"{data.version}:{name}")
+    return replace(data, **frozen)
+
+
+@traced
+def build_derived(df_raw: pd.DataFrame,
+                  household_size: float = AVERAGE_HOUSEHOLD_SIZE,
+                  compact: bool = False) -> DerivedData:
+    """
+    Run the full data_utils pipeline on a raw frame. The configured
+    aggregation engine (engines.get_engine) groups the ZIP rows once, into
+    the metro x month matrix, and the aggregates are reductions of it.
+    Aggregates are always computed at full precision; with compact=True the
+    ZIP-level frame that is kept afterwards is narrowed with compact_frame.
+    """
+    engine = get_engine()
+    df = add_derived_columns(df_raw, household_size=household_size)
+    matrix = engine.metro_month_matrix(df)
+    summary = matrix.summary()
+    metro_series = matrix.metro_series()
+    return DerivedData(
+        comp=matrix.composite(),
+        summary=summary,
+        counts=engine.affordability_counts_by_year(summary),
+        metro_pti=matrix.metro_pti(),
+        metro_series=metro_series,
+        latest_zips=latest_zip_snapshot(df),
+        metro_trends=metro_year_analytics(summary, metro_series),
+        metro_rolling=metro_month_analytics(metro_series),
+        year_ranks=year_rankings(summary),
+        payment_grid=finalize_payment_grid(payment_to_income_partials(df)),
+        year_latest=latest_year(summary),
+        df=compact_frame(df) if compact else df,
+    )
+
+
+def derived_from_accumulator(acc: AggregateAccumulator) -> DerivedData:
+    """Aggregates from accumulated sums/counts (no ZIP-level frame)."""
+    matrix = acc.matrix()
+    summary = matrix.summary()
+    metro_series = matrix.metro_series()
+    return DerivedData(
+        comp=matrix.composite(),
+        summary=summary,
+        counts=affordability_counts_by_year(summary),
+        metro_pti=matrix.metro_pti(),
+        metro_series=metro_series,
+        latest_zips=acc.latest_zips,
+        metro_trends=metro_year_analytics(summary, metro_series),
+        metro_rolling=metro_month_analytics(metro_series),
+        year_ranks=year_rankings(summary),
+        payment_grid=acc.payment_grid(),
+        year_latest=latest_year(summary),
+    )
+
+
+def stream_accumulate(path: str = DEFAULT_DATA_PATH,
+                      household_size: float = AVERAGE_HOUSEHOLD_SIZE,
+                      chunksize: int = 500_000) -> AggregateAccumulator:
+    """Derive each CSV chunk and fold it into an AggregateAccumulator."""
+    acc = AggregateAccumulator()
+    for chunk in iter_raw_chunks(path, chunksize):
+        acc.add(add_derived_columns(chunk, household_size=household_size))
+    return acc
+
+
+@traced
+def stream_derived(path: str = DEFAULT_DATA_PATH,
+                   household_size: float = AVERAGE_HOUSEHOLD_SIZE,
+                   chunksize: int = 500_000) -> DerivedData:
+    """
+    Out-of-core build_derived. Peak memory follows chunksize, not file
+    size; the result has no ZIP-level frame (df is None).
+    """
+    return derived_from_accumulator(stream_accumulate(path, household_size, chunksize))
+
+
+@st.cache_resource(show_spinner="Preparing affordability data …", max_entries=4)
+def _cached_derived(fingerprint: str, household_size: float, _path: str) -> DerivedData:
+    # keyed on the content fingerprint + parameters; _path is not hashed.
+    # A resource, not cache_data: every session gets this same object
+    # rather than an unpickled copy of it.
+    data = build_derived(read_ingested(_path), household_size=household_size)
+    # no page reads the ZIP-level frame, so it is not kept per process
+    return freeze_derived(replace(data, df=None, version=f"{fingerprint}:{household_size}"))
+
+
+@traced
+def load_derived(path: str = DEFAULT_DATA_PATH,
+                 household_size: float = AVERAGE_HOUSEHOLD_SIZE) -> DerivedData:
+    """
+    Aggregates for `path`, built once per process and shared read-only by
+    every session and page. Replacing the file changes its fingerprint
+    and rebuilds. Like a snapshot, the result has no ZIP-level frame
+    (df is None); use build_derived (compact=True for a narrow frame)
+    where the rows are needed.
+    """
+    return _cached_derived(file_fingerprint(path), household_size, path)
+
+
+# ---------- SNAPSHOTS ----------
+
+def write_snapshot(data: DerivedData, out_dir: str = DEFAULT_SNAPSHOT_DIR,
+                   source_fingerprint: str | None = None,
+                   household_size: float = AVERAGE_HOUSEHOLD_SIZE,
+                   accumulator: AggregateAccumulator | None = None,
+                   appends: list[str] | None = None,
+                   source_stat: list[int] | None = None) -> str:
+    """
+    Write the aggregates (not the ZIP-level frame) as one Parquet file per
+    table plus a manifest.json. The directory is swapped in atomically.
+    source_stat (file_stat of the source, taken before its fingerprint)
+    lets load_app_data skip hashing an unchanged source file.
+
+    With an accumulator its sums/counts are stored too, which makes the
+    snapshot appendable (see append_to_snapshot).
+    """
+    tmp_dir = out_dir.rstrip("/\\") + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    for name in SNAPSHOT_TABLES:
+        getattr(data, name).to_parquet(os.path.join(tmp_dir, f"{name}.parquet"), index=False)
+
+    state_tables = []
+    if accumulator is not None:
+        for name, table in accumulator.to_tables().items():
+            state_tables.append(name)
+            table.to_parquet(os.path.join(tmp_dir, f"acc_{name}.parquet"), index=False)
+
+    manifest = {
+        "version": SNAPSHOT_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "source_fingerprint": source_fingerprint,
+        "source_stat": source_stat,
+        "appends": appends or [],
+        "household_size": household_size,
+        "year_latest": data.year_latest,
+        "tables": SNAPSHOT_TABLES,
+        "state_tables": state_tables,
+        "rows": accumulator.rows if accumulator is not None else None,
+    }
+    with open(os.path.join(tmp_dir, "manifest.json"), "w") as fh:
+        json.dump(manifest, fh, indent=2)
+
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+    return out_dir
+
+
+def read_snapshot_manifest(snapshot_dir: str = DEFAULT_SNAPSHOT_DIR) -> dict | None:
+    """Manifest of a snapshot, or None if missing or of another version."""
+    try:
+        with open(os.path.join(snapshot_dir, "manifest.json")) as fh:
+            manifest = json.load(fh)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != SNAPSHOT_VERSION:
+        return None
+    return manifest
+
+
+def read_snapshot(snapshot_dir: str = DEFAULT_SNAPSHOT_DIR) -> DerivedData:
+    manifest = read_snapshot_manifest(snapshot_dir)
+    if manifest is None:
+        raise FileNotFoundError(f"No usable snapshot in {snapshot_dir}")
+    tables = {
+        name: pd.read_parquet(os.path.join(snapshot_dir, f"{name}.parquet"))
+        for name in SNAPSHOT_TABLES
+    }
+    version = ":".join([
+        "snapshot",
+        manifest["created"],
+        str(manifest.get("source_fingerprint")),
+        str(len(manifest.get("appends", []))),
+    ])
+    return DerivedData(year_latest=int(manifest["year_latest"]), version=version, **tables)
+
+
+def read_snapshot_accumulator(snapshot_dir: str = DEFAULT_SNAPSHOT_DIR) -> AggregateAccumulator:
+    manifest = read_snapshot_manifest(snapshot_dir)
+    if manifest is None or not manifest.get("state_tables"):
+        raise FileNotFoundError(f"No appendable snapshot in {snapshot_dir}")
+    tables = {
+        name: pd.read_parquet(os.path.join(snapshot_dir, f"acc_{name}.parquet"))
+        for name in manifest["state_tables"]
+    }
+    return AggregateAccumulator.from_tables(tables, rows=manifest.get("rows") or 0)
+
+
+@traced
+def append_to_snapshot(new_rows: pd.DataFrame,
+                       snapshot_dir: str = DEFAULT_SNAPSHOT_DIR,
+                       batch_id: str | None = None) -> DerivedData:
+    """
+    Fold raw rows for new months into an appendable snapshot and rewrite
+    its aggregates from the stored sums/counts, without revisiting the
+    existing ZIP rows. composite_series' base-year index is recomputed
+    from the full per-date means, so it stays anchored to the first year.
+    """
+    manifest = read_snapshot_manifest(snapshot_dir)
+    acc = read_snapshot_accumulator(snapshot_dir)
+    household_size = manifest["household_size"]
+
+    acc.append(add_derived_columns(new_rows, household_size=household_size))
+    data = derived_from_accumulator(acc)
+
+    write_snapshot(
+        data,
+        snapshot_dir,
+        source_fingerprint=manifest.get("source_fingerprint"),
+        household_size=household_size,
+        accumulator=acc,
+        appends=manifest.get("appends", []) + [batch_id or f"{len(new_rows)} rows"],
+        source_stat=manifest.get("source_stat"),
+    )
+    return data
+
+
+@st.cache_resource(show_spinner="Loading precomputed snapshot …", max_entries=2)
+def _cached_snapshot(created: str, source_fingerprint: str | None, appends: tuple,
+                     _snapshot_dir: str) -> DerivedData:
+    # keyed on the manifest identity so a rebuilt snapshot is picked up
+    return freeze_derived(read_snapshot(_snapshot_dir))
+
+
+@traced
+def load_app_data(path: str = DEFAULT_DATA_PATH,
+                  snapshot_dir: str = DEFAULT_SNAPSHOT_DIR,
+                  household_size: float = AVERAGE_HOUSEHOLD_SIZE) -> DerivedData:
+    """
+    Serve-time entry point: use the precomputed snapshot when there is one
+    for these parameters, unless the source file is present and has
+    changed since it was built (the file is only hashed if its size/mtime
+    differ from the manifest's). Otherwise fall back to load_derived.
+    Either way the result is one shared, read-only DerivedData.
+    """
+    manifest = read_snapshot_manifest(snapshot_dir)
+    usable = (
+        manifest is not None
+        and manifest.get("household_size") == household_size
+        and (
+            not os.path.exists(path)
+            or manifest.get("source_fingerprint") == source_fingerprint(path, manifest)
+        )
+    )
+    if usable:
+        return _cached_snapshot(
+            manifest["created"],
+            manifest.get("source_fingerprint"),
+            tuple(manifest.get("appends", [])),
+            snapshot_dir,
+        )
+    return load_derived(path, household_size)
@@ -0,0 +1,92 @@
+# price_finder.py
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+
+class ZipPriceIndex:
+    """
+    Latest-month ZIP prices in sorted arrays, for "ZIPs where price
+    <= k x income" queries.
+
+    Rows are ordered by (metro, price), so each metro is one contiguous,
+    price-sorted slice; a second permutation orders all ZIPs by price.
+    A query is a binary search and a slice, never a frame scan.
+    """
+
+    def __init__(self, latest_zips: pd.DataFrame):
+        latest = latest_zips.dropna(subset=["median_sale_price"])
+        metro = latest["city_full"].astype(str).astype("category")
+        codes = metro.cat.codes.to_numpy(dtype="int64")
+        price = latest["median_sale_price"].to_numpy(dtype="float64")
+
+        order = np.lexsort((price, codes))
+        self.metros = list(metro.cat.categories)
+        self._metro_pos = {name: i for i, name in enumerate(self.metros)}
+
+        self.metro_codes = codes[order]
+        self.price = price[order]
+        self.zipcode = latest["zipcode"].to_numpy()[order]
+        self.rent = latest["Median Rent"].to_numpy(dtype="float64")[order]
+        self.income = latest["median_household_income_est"].to_numpy(dtype="float64")[order]
+        self.pti = latest["price_to_income"].to_numpy(dtype="float64")[order]
+        self.date = latest["date"].to_numpy()[order]
+
+        # metro i occupies rows bounds[i]:bounds[i + 1]
+        self.bounds = np.searchsorted(self.metro_codes, np.arange(len(self.metros) + 1))
+
+        # (metro, price) folded into one sorted key for per-metro counts
+        self._span = float(self.price.max()) + 1.0 if len(self.price) else 1.0
+        self._key = self.metro_codes * self._span + self.price
+
+        self.by_price = np.argsort(self.price, kind="stable")
+        self._price_sorted = self.price[self.by_price]
+
+    def __len__(self) -> int:
+        return len(self.price)
+
+    def metro_size(self, metro: str) -> int:
+        i = self._metro_pos[metro]
+        return int(self.bounds[i + 1] - self.bounds[i])
+
+    def query(self, income: float, multiple: float, metro: str | None = None) -> np.ndarray:
+        """Row positions of ZIPs with price <= multiple * income (cheapest first)."""
+        cap = income * multiple
+        if metro is None:
+            n = np.searchsorted(self._price_sorted, cap, side="right")
+            return self.by_price[:n]
+        i = self._metro_pos[metro]
+        lo, hi = self.bounds[i], self.bounds[i + 1]
+        n = np.searchsorted(self.price[lo:hi], cap, side="right")
+        return np.arange(lo, lo + n)
+
+    def counts_by_metro(self, income: float, multiple: float) -> pd.DataFrame:
+        """Affordable and total ZIPs per metro, from one vectorized search."""
+        cap = min(income * multiple, self._span - 0.5)
+        targets = np.arange(len(self.metros)) * self._span + cap
+        affordable = np.searchsorted(self._key, targets, side="right") - self.bounds[:-1]
+        total = np.diff(self.bounds)
+        return pd.DataFrame({
+            "city_full": self.metros,
+            "affordable_zips": affordable,
+            "total_zips": total,
+            "share": affordable / np.maximum(total, 1),
+        })
+
+    def frame(self, rows: np.ndarray) -> pd.DataFrame:
+        """Display table for query() results."""
+        return pd.DataFrame({
+            "ZIP": pd.Series(self.zipcode[rows]).astype(str).str.zfill(5),
+            "Metro": np.asarray(self.metros, dtype=object)[self.metro_codes[rows]],
+            "Median sale price": self.price[rows],
+            "Median rent": self.rent[rows],
+            "Household income (est.)": self.income[rows],
+            "PTI": self.pti[rows],
+            "Month": self.date[rows],
+        })
+
+
+@st.cache_resource(show_spinner="Indexing ZIP prices …", max_entries=2)
+def get_price_index(version: str, _latest_zips: pd.DataFrame) -> ZipPriceIndex:
+    """One shared index per data version (the frame itself is not hashed)."""
+    return ZipPriceIndex(_latest_zips)
@@ -0,0 +1,125 @@
+# scenarios.py
+"""
+What-if evaluation of household size and affordability thresholds,
+straight from the cached aggregates.
+
+Household income is per-capita income x household size, so every PTI
+in `summary` and `comp` (means of ZIP-level PTI) scales exactly by
+base_size / size for another household size; no ZIP rows are needed.
+evaluate_scenarios takes a batch of (household size, thresholds)
+scenarios and computes all of them at once with broadcasting:
+
+    from scenarios import Scenario, evaluate_scenarios, scenario_grid
+    grid = scenario_grid([2.0, 2.54, 3.0], [(3, 4, 5, 8.9), (2.5, 3.5, 4.5, 7.0)])
+    results = evaluate_scenarios(data.summary, data.comp, grid)
+    results.counts      # scenario, year, affordability_rating, n_metros
+    results.composite   # scenario, date, composite_pti, affordability_rating
+"""
+import itertools
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from diagnostics import traced
+from data_utils import (
+    AFFORDABILITY_ORDER,
+    AFFORDABILITY_THRESHOLDS,
+    AVERAGE_HOUSEHOLD_SIZE,
+)
+
+
+@dataclass(frozen=True)
+class Scenario:
+    household_size: float = AVERAGE_HOUSEHOLD_SIZE
+    # upper PTI bound (inclusive) of each band but the last
+    thresholds: tuple[float, ...] = tuple(AFFORDABILITY_THRESHOLDS)
+
+
+def scenario_grid(household_sizes, threshold_sets) -> list[Scenario]:
+    """Every combination of the given household sizes and threshold sets."""
+    return [
+        Scenario(float(size), tuple(float(t) for t in thresholds))
+        for size, thresholds in itertools.product(household_sizes, threshold_sets)
+    ]
+
+
+@dataclass(frozen=True)
+class ScenarioResults:
+    scenarios: pd.DataFrame    # scenario, household_size, thresholds
+    counts: pd.DataFrame       # scenario, year, affordability_rating, n_metros
+    composite: pd.DataFrame    # scenario, date, year, composite_pti, affordability_rating
+
+
+def _bands(pti: np.ndarray, thresholds: np.ndarray) -> np.ndarray:
+    """
+    Band codes of a (scenarios, n) PTI matrix against per-scenario
+    thresholds (scenarios, k), as classify_affordability_array: a PTI on
+    a threshold falls in the lower band, NaN gives -1.
+    """
+    codes = (pti[:, :, None] > thresholds[:, None, :]).sum(axis=2)
+    return np.where(np.isnan(pti), -1, codes)
+
+
+def _rated(codes: np.ndarray) -> pd.Categorical:
+    return pd.Categorical.from_codes(codes, categories=AFFORDABILITY_ORDER, ordered=True)
+
+
+@traced
+def evaluate_scenarios(summary: pd.DataFrame, comp: pd.DataFrame, scenarios,
+                       base_household_size: float = AVERAGE_HOUSEHOLD_SIZE) -> ScenarioResults:
+    """
+    Band counts per year and composite PTI per date for every scenario.
+
+    summary and comp are the aggregates built with base_household_size
+    (yearly_metro_summary / composite_series). The counts match what
+    affordability_counts_by_year would give after rebuilding the
+    pipeline with each scenario's household size and thresholds.
+    """
+    scenarios = list(scenarios)
+    sizes = np.array([s.household_size for s in scenarios], dtype="float64")
+    thresholds = np.array([s.thresholds for s in scenarios], dtype="float64")
+    if thresholds.ndim != 2 or thresholds.shape[1] != len(AFFORDABILITY_ORDER) - 1:
+        raise ValueError(
+            f"Each scenario needs {len(AFFORDABILITY_ORDER) - 1} thresholds, one per band boundary"
+        )
+    if (np.diff(thresholds, axis=1) <= 0).any():
+        raise ValueError("Scenario thresholds must be strictly increasing")
+    if (sizes <= 0).any():
+        raise ValueError("Household sizes must be positive")
+
+    n_scenarios, n_bands = len(scenarios), len(AFFORDABILITY_ORDER)
+    scale = (base_household_size / sizes)[:, None]
+
+    # ---- metros per band and year ----
+    years, year_idx = np.unique(summary["year"].to_numpy(), return_inverse=True)
+    bands = _bands(scale * summary["price_to_income"].to_numpy(dtype="float64")[None, :], thresholds)
+    cell = (np.arange(n_scenarios)[:, None] * len(years) + year_idx[None, :]) * n_bands + bands
+    tally = np.bincount(cell[bands >= 0], minlength=n_scenarios * len(years) * n_bands)
+
+    s_idx, y_idx, b_idx = np.unravel_index(np.arange(tally.size), (n_scenarios, len(years), n_bands))
+    observed = tally > 0
+    counts = pd.DataFrame({
+        "scenario": s_idx[observed],
+        "year": years[y_idx[observed]],
+        "affordability_rating": _rated(b_idx[observed]),
+        "n_metros": tally[observed].astype("int64"),
+    })
+
+    # ---- composite PTI per date ----
+    pti = scale * comp["composite_pti"].to_numpy(dtype="float64")[None, :]
+    n_dates = pti.shape[1]
+    composite = pd.DataFrame({
+        "scenario": np.repeat(np.arange(n_scenarios), n_dates),
+        "date": np.tile(comp["date"].to_numpy(), n_scenarios),
+        "year": np.tile(comp["year"].to_numpy(), n_scenarios),
+        "composite_pti": pti.ravel(),
+        "affordability_rating": _rated(_bands(pti, thresholds).ravel()),
+    })
+
+    table = pd.DataFrame({
+        "scenario": np.arange(n_scenarios),
+        "household_size": sizes,
+        "thresholds": [s.thresholds for s in scenarios],
+    })
+    return ScenarioResults(scenarios=table, counts=counts, composite=composite)
@@ -0,0 +1,38 @@
+# serve.py
+"""
+Start the Streamlit server with caches warming up in the background.
+
+    python -m serve [--ready-port 8502] [app.py] [streamlit run options]
+
+Equivalent to `streamlit run <script> ...`, but the warm-up (see
+warmup.py) starts in this process before the server accepts requests,
+and with --ready-port (or HOUSING_READY_PORT) a readiness probe is
+served on that port.
+"""
+import argparse
+import os
+import sys
+
+from warmup import READY_PORT_ENV, serve_readiness_probe, start_warmup
+
+DEFAULT_SCRIPT = "app.py"
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("script", nargs="?", default=DEFAULT_SCRIPT)
+    parser.add_argument("--ready-port", type=int, default=os.environ.get(READY_PORT_ENV))
+    args, streamlit_args = parser.parse_known_args(argv)
+
+    start_warmup()
+    if args.ready_port:
+        serve_readiness_probe(int(args.ready_port))
+
+    from streamlit.web import cli
+
+    sys.argv = ["streamlit", "run", args.script, *streamlit_args]
+    return cli.main()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,132 @@
+# warmup.py
+"""
+Prime the data, aggregate, index and figure caches in a background thread
+so the first visitor after a restart does not pay for the pipeline.
+
+start_warmup() runs warm-up once per process (again only after a failed
+attempt, e.g. while the data file is still missing): serve.py calls it
+before the Streamlit server starts, and the page scripts call it too so
+a plain `streamlit run` warms up on the first visit. A session that asks for
+data while warm-up is running waits on the same in-flight computation
+(st.cache_resource holds a lock per cache key) instead of starting
+another one.
+
+serve_readiness_probe(port) answers GET /ready with 200 once warm-up has
+finished or data is being served (503 before, 500 if warm-up failed and
+no data is loaded; each probe then retries warm-up) and GET /live with 200.
+
+The first start_warmup() also starts the data file watcher (hot_reload.py)
+and registers prime() as its prepare hook, whatever the first load does,
+so a reloaded version goes live with its indexes and figures already built.
+"""
+import json
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from chapters import CHAPTERS, build_figures
+from hot_reload import current_data, data_store, start_watcher
+from metro_index import get_metro_index
+from price_finder import get_price_index
+
+READY_PORT_ENV = "HOUSING_READY_PORT"
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="warmup")
+_lock = threading.Lock()
+_future: Future | None = None
+_status = {
+    "state": "idle", "started": None, "finished": None, "error": None,
+    "version": None, "steps": {},
+}
+
+
+def _step(name: str, fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    _status["steps"][name] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def prime(data) -> None:
+    """Build the indexes and chapter figures for one data version."""
+    _step("price_index", get_price_index, data.version, data.latest_zips)
+    _step("metro_index", get_metro_index, data.version, data.metro_series)
+    for chapter in CHAPTERS:
+        _step(f"figures:{chapter.key}", build_figures, chapter, chapter.inputs(data))
+    _status["version"] = data.version
+
+
+def _warm() -> None:
+    _status.update(state="warming", started=time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                   finished=None, error=None)
+    try:
+        prime(_step("data", current_data))
+    except Exception as exc:
+        _status.update(state="failed", error=f"{type(exc).__name__}: {exc}")
+        raise
+    finally:
+        _status["finished"] = time.strftime("%Y-%m-%dT%H:%M:%S%z")
+    _status["state"] = "ready"
+
+
+def start_warmup() -> Future:
+    """Start warm-up unless it is running or has succeeded in this process."""
+    global _future
+    with _lock:
+        if _future is None:
+            data_store.add_prepare_hook(prime)
+            start_watcher()
+        if _future is None or (_future.done() and _future.exception() is not None):
+            _future = _executor.submit(_warm)
+        return _future
+
+
+def wait_until_ready(timeout: float | None = None) -> bool:
+    """Block until warm-up has finished; False on timeout or failure."""
+    try:
+        start_warmup().result(timeout=timeout)
+    except Exception:
+        return False
+    return True
+
+
+def warmup_status() -> dict:
+    active = data_store.active
+    return {
+        **_status, "steps": dict(_status["steps"]), "reloads": data_store.swaps,
+        "serving": active.version if active is not None else None,
+    }
+
+
+class _ProbeHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") == "/live":
+            code, status = 200, warmup_status()
+        elif self.path.rstrip("/") == "/ready":
+            if _status["state"] == "failed":
+                start_warmup()
+            status = warmup_status()
+            if status["state"] == "ready" or status["serving"] is not None:
+                code = 200
+            else:
+                code = 500 if status["state"] == "failed" else 503
+        else:
+            self.send_error(404)
+            return
+        body = json.dumps(status).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_readiness_probe(port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Serve /ready and /live on `port` from a daemon thread."""
+    server = ThreadingHTTPServer((host, port), _ProbeHandler)
+    threading.Thread(target=server.serve_forever, name="warmup-probe", daemon=True).start()
+    return server